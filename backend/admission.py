@@ -0,0 +1,137 @@
+import logging
+import math
+import threading
+import time
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+from flask import jsonify
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """Concurrency limit with a bounded wait queue."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 1.0  # EWMA of seconds a request holds a slot
+        self._cond = threading.Condition()
+
+    def retry_after(self) -> int:
+        """Rough seconds until a slot frees up for a new arrival."""
+        backlog = (self.waiting + 1) / max(1, self.concurrency)
+        return max(1, math.ceil(self.service_time * backlog))
+
+    def acquire(self, wait_until: float) -> None:
+        with self._cond:
+            if self.active < self.concurrency:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                raise Overloaded(f"{self.name} queue is full", self.retry_after())
+
+            self.waiting += 1
+            try:
+                while self.active >= self.concurrency:
+                    remaining = wait_until - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded(f"Timed out waiting for {self.name}", self.retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        with self._cond:
+            self.active -= 1
+            if held_for is not None:
+                self.service_time = 0.8 * self.service_time + 0.2 * held_for
+            self._cond.notify()
+
+
+class AdmissionController:
+    """Per-endpoint concurrency limits with bounded queues and queue-time deadlines.
+
+    Expensive endpoints are wrapped with limit(name). A request first takes a
+    slot in its endpoint's lane and then one in the shared 'expensive' lane.
+    A request waiting in a queue blocks a server thread just like a running
+    one, so at most thread_budget expensive requests may be admitted or
+    queued at once; with thread_budget below the server's thread count the
+    routes that are not limited (the health check, job polling, ...) always
+    find a free worker. A request beyond the thread budget, that finds its
+    queue full, or that cannot get a slot within its lane's queue_timeout gets
+    a fast 503 with a Retry-After estimate instead of piling up.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Any]], expensive_total: int,
+                 thread_budget: int):
+        self.logger = logging.getLogger(__name__)
+        self.limits = limits
+        self.thread_budget = thread_budget
+        self._lanes = {
+            name: _Lane(name, limit['concurrency'], limit['queue'])
+            for name, limit in limits.items()
+        }
+        self._shared = _Lane('expensive', expensive_total, max(0, thread_budget - expensive_total))
+        self._threads_held = 0
+        self._threads_lock = threading.Lock()
+
+    def _take_thread(self) -> None:
+        with self._threads_lock:
+            if self._threads_held >= self.thread_budget:
+                raise Overloaded("No server threads to spare", self._shared.retry_after())
+            self._threads_held += 1
+
+    def _return_thread(self) -> None:
+        with self._threads_lock:
+            self._threads_held -= 1
+
+    def _acquire(self, name: str) -> List[_Lane]:
+        self._take_thread()
+        wait_until = time.monotonic() + self.limits[name]['queue_timeout']
+        held = []
+        try:
+            for lane in (self._lanes[name], self._shared):
+                lane.acquire(wait_until)
+                held.append(lane)
+        except Overloaded:
+            for lane in held:
+                lane.release()
+            self._return_thread()
+            raise
+        return held
+
+    def limit(self, name: str):
+        """Decorate a Flask view so it only runs once admitted to the named lane."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    held = self._acquire(name)
+                except Overloaded as e:
+                    self.logger.warning(f"Shedding {name} request: {str(e)}")
+                    response = jsonify({'error': 'Service overloaded, please retry later'})
+                    response.status_code = 503
+                    response.headers['Retry-After'] = str(e.retry_after)
+                    return response
+
+                started = time.monotonic()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    for lane in reversed(held):
+                        lane.release(time.monotonic() - started)
+                    self._return_thread()
+            return wrapper
+        return decorator
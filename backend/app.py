@@ -1,10 +1,26 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 import logging
 from newsapi import NewsApiClient
 from market_analysis import MarketAnalyst
 from company_research import CompanyResearch
+from retrieval_index import RetrievalIndex
+from news_store import NewsStore
+from jobs import JobManager, JobQueueFull
+from filing_store import FilingStore
+from model_router import ModelRouter
+from cache import TTLCache
+from prefetch import Prefetcher
+from admission import AdmissionController
+from profiling import SamplingProfiler, call_tree
+from sentiment import SentimentScorer
+from deadline import Deadline, DeadlineExceeded, run_within, start_within, wait_within
 from config import get_config
+from chart_data import CHART_FORMATS
+import cProfile
+import gzip
+import hmac
+import time
 import os
 from dotenv import load_dotenv
 
@@ -31,8 +47,83 @@ CORS(app, resources={
 
 # Initialize clients
 newsapi = NewsApiClient(api_key=app.config['NEWS_API_KEY'])
-market_analyst = MarketAnalyst()
-company_research = CompanyResearch()
+news_store = NewsStore(
+    newsapi,
+    window_size=app.config['NEWS_WINDOW_SIZE'],
+    refresh_interval=app.config['NEWS_REFRESH_INTERVAL']
+)
+retrieval_index = RetrievalIndex(
+    chunk_size=app.config['RETRIEVAL_CHUNK_SIZE'],
+    max_chunks_per_company=app.config['RETRIEVAL_MAX_CHUNKS']
+)
+filing_store = None
+if app.config['SEC_API_KEY']:
+    filing_store = FilingStore(
+        app.config['FILING_DB_PATH'],
+        api_key=app.config['SEC_API_KEY'],
+        stale_after=2 * app.config['FILING_SYNC_INTERVAL']
+    )
+company_research = CompanyResearch(
+    retrieval_index=retrieval_index,
+    filing_store=filing_store,
+    research_cache=TTLCache(ttl=app.config['RESEARCH_CACHE_TTL'])
+)
+job_manager = JobManager(
+    max_workers=app.config['JOB_MAX_WORKERS'],
+    max_pending=app.config['JOB_MAX_PENDING'],
+    result_ttl=app.config['JOB_RESULT_TTL']
+)
+model_router = ModelRouter(
+    models={
+        'fast': {
+            'model': app.config['LLM_FAST_MODEL'],
+            'expected_latency': app.config['LLM_FAST_EXPECTED_LATENCY'],
+            'cost_per_1k_tokens': app.config['LLM_FAST_COST_PER_1K']
+        },
+        'deep': {
+            'model': app.config['LLM_DEEP_MODEL'],
+            'expected_latency': app.config['LLM_DEEP_EXPECTED_LATENCY'],
+            'cost_per_1k_tokens': app.config['LLM_DEEP_COST_PER_1K']
+        }
+    },
+    routes=app.config['LLM_ROUTES']
+)
+sentiment_scorer = SentimentScorer(
+    cache_size=app.config['SENTIMENT_CACHE_SIZE'],
+    neutral_band=app.config['SENTIMENT_NEUTRAL_BAND']
+)
+market_analyst = MarketAnalyst(
+    company_research=company_research,
+    retrieval_index=retrieval_index,
+    retrieval_top_k=app.config['RETRIEVAL_TOP_K'],
+    sec_budget_fraction=app.config['SEC_BUDGET_FRACTION'],
+    model_router=model_router,
+    history_cache=TTLCache(ttl=app.config['HISTORY_CACHE_TTL']),
+    sentiment_scorer=sentiment_scorer
+)
+admission = AdmissionController(
+    app.config['ADMISSION_LIMITS'],
+    expensive_total=app.config['ADMISSION_EXPENSIVE_TOTAL'],
+    thread_budget=app.config['ADMISSION_THREAD_BUDGET']
+)
+sampling_profiler = SamplingProfiler(
+    app.config['PROFILE_OUTPUT_DIR'],
+    interval=app.config['SAMPLING_PROFILER_INTERVAL'],
+    flush_interval=app.config['SAMPLING_PROFILER_FLUSH_INTERVAL'],
+    file_period=app.config['SAMPLING_PROFILER_FILE_PERIOD'],
+    max_files=app.config['SAMPLING_PROFILER_MAX_FILES']
+)
+# `python app.py` runs the Werkzeug reloader, which imports this module in a
+# file-watching parent as well as in the child that serves requests
+# (WERKZEUG_RUN_MAIN=true); background workers belong only in the latter
+SERVING_PROCESS = __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+if SERVING_PROCESS and app.config['SAMPLING_PROFILER_ENABLED']:
+    sampling_profiler.start()
+prefetcher = Prefetcher(
+    market_analyst,
+    max_in_flight=app.config['PREFETCH_MAX_IN_FLIGHT'],
+    min_interval=app.config['PREFETCH_MIN_INTERVAL']
+)
 
 COMPANIES = {
     'AAPL': 'Apple',
@@ -44,6 +135,142 @@ COMPANIES = {
     'NVDA': 'NVIDIA'
 }
 
+def parse_chart_options():
+    """Read chart_format and max_points from the query string."""
+    chart_format = request.args.get('chart_format', 'rows')
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Invalid chart_format: {chart_format}")
+
+    max_points = request.args.get('max_points')
+    if max_points is None:
+        return chart_format, None
+    try:
+        max_points = int(max_points)
+    except ValueError:
+        raise ValueError(f"Invalid max_points: {max_points}")
+    if not 3 <= max_points <= app.config['CHART_MAX_POINTS_LIMIT']:
+        raise ValueError(f"max_points must be between 3 and {app.config['CHART_MAX_POINTS_LIMIT']}")
+    return chart_format, max_points
+
+def parse_period():
+    """Read the analysis period from the query string, default to 5d."""
+    period = request.args.get('period', '5d')
+    if period not in ['1d', '5d', '1mo', '3mo', '1y']:
+        raise ValueError('Invalid period')
+    return period
+
+@app.before_request
+def mark_request_start():
+    g.request_started = time.monotonic()
+
+def request_deadline():
+    """Deadline for answering the current request, within the load balancer timeout.
+    
+    Counted from when the request arrived, so time spent queued for admission
+    comes out of the budget.
+    """
+    elapsed = time.monotonic() - g.request_started
+    return Deadline(app.config['REQUEST_DEADLINE_SECONDS'] - elapsed)
+
+def fetch_news_within(deadline, company, limit, omitted_sources):
+    """Get stored news within the news budget, or none if it does not arrive in time."""
+    news_deadline = deadline.slice(max_seconds=app.config['NEWS_BUDGET_SECONDS']) if deadline else None
+    try:
+        return run_within(news_deadline, "news", "news", news_store.get_articles, company, COMPANIES[company], limit)
+    except DeadlineExceeded as e:
+        logger.warning(f"Omitting news for {company}: {str(e)}")
+        omitted_sources.append('news')
+        return []
+
+def parse_depth():
+    """Read the analysis depth from the query string, default to full."""
+    depth = request.args.get('depth', 'full')
+    if depth not in ['full', 'summary']:
+        raise ValueError('Invalid depth')
+    return depth
+
+def run_market_analysis(company, period, chart_format, max_points, deadline=None, depth='full'):
+    """Fetch news and run the market analysis for a company."""
+    logger.info(f"Fetching news for {company}")
+    # Get news first
+    omitted_sources = []
+    # The whole window feeds the sentiment score; the prompt lists the newest five
+    news_articles = fetch_news_within(deadline, company, app.config['NEWS_WINDOW_SIZE'], omitted_sources)
+    
+    logger.info(f"Getting market analysis for {company} with period {period}")
+    analysis = market_analyst.analyze_market(
+        company_name=COMPANIES[company],
+        symbol=company,
+        news_articles=news_articles,
+        period=period,
+        chart_format=chart_format,
+        max_points=max_points,
+        deadline=deadline,
+        depth=depth
+    )
+    if analysis.get('success'):
+        analysis['omitted_sources'] = omitted_sources + analysis['omitted_sources']
+    return analysis
+
+@app.after_request
+def add_etag_and_compress(response):
+    """Answer unchanged JSON with 304 Not Modified and gzip the rest."""
+    if not request.path.startswith('/api/') or response.mimetype != 'application/json':
+        return response
+    if response.direct_passthrough:
+        return response
+
+    if request.method in ('GET', 'HEAD') and response.status_code == 200:
+        # Weak ETag: the representation is the same JSON whether or not it is gzipped
+        response.add_etag(weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+
+    response.vary.add('Accept-Encoding')
+    if (response.status_code == 200
+            and 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+            and 'Content-Encoding' not in response.headers):
+        body = response.get_data()
+        if len(body) >= app.config['COMPRESS_MIN_SIZE']:
+            response.set_data(gzip.compress(body, compresslevel=app.config['COMPRESS_LEVEL']))
+            response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def profiling_allowed():
+    """Profiling is open in dev config and otherwise needs the admin token."""
+    if app.config['PROFILING_ENABLED']:
+        return True
+    token = app.config['ADMIN_TOKEN']
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+@app.before_request
+def start_request_profile():
+    if request.args.get('profile', '').lower() in ('1', 'true', 'yes') and profiling_allowed():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+# Registered after add_etag_and_compress so it runs first, on the uncompressed body
+@app.after_request
+def attach_request_profile(response):
+    """Add the call-tree profile of a profiled request to its JSON body."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    if response.mimetype != 'application/json' or response.direct_passthrough:
+        return response
+
+    body = response.get_json()
+    if not isinstance(body, dict):
+        body = {'data': body}
+    body['profile'] = call_tree(profiler)
+    response.set_data(app.json.dumps(body))
+    return response
+
+# Keep the filing mirror current for the tracked companies
+if filing_store and SERVING_PROCESS:
+    filing_store.start_background_sync(list(COMPANIES), interval=app.config['FILING_SYNC_INTERVAL'])
+
 @app.route('/api/companies', methods=['GET'])
 def get_companies():
     return jsonify([
@@ -60,19 +287,52 @@ def get_company_news(company):
         return jsonify({'error': 'Company not found'}), 404
     
     try:
-        news = newsapi.get_everything(
-            q=COMPANIES[company],
-            language='en',
-            sort_by='publishedAt',
-            page_size=5
-        )
+        limit = request.args.get('limit', '5')
+        if not limit.isdigit() or not 1 <= int(limit) <= app.config['NEWS_WINDOW_SIZE']:
+            logger.error(f"Invalid limit: {limit}")
+            return jsonify({'error': 'Invalid limit'}), 400
+        
+        # The analysis usually follows; start loading its inputs now
+        prefetcher.prefetch(company, COMPANIES[company])
+        
+        articles = news_store.get_articles(company, COMPANIES[company], limit=int(limit))
         logger.info(f"Successfully fetched news for {company}")
-        return jsonify(news)
+        return jsonify({
+            'status': 'ok',
+            'totalResults': len(articles),
+            'articles': articles
+        })
     except Exception as e:
         logger.error(f"Error fetching news: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sentiment/<company>', methods=['GET'])
+def get_company_sentiment(company):
+    logger.info(f"Received sentiment request for {company}")
+    
+    if company not in COMPANIES:
+        logger.error(f"Company not found: {company}")
+        return jsonify({'error': 'Company not found'}), 404
+    
+    try:
+        limit = request.args.get('limit', str(app.config['NEWS_WINDOW_SIZE']))
+        if not limit.isdigit() or not 1 <= int(limit) <= app.config['NEWS_WINDOW_SIZE']:
+            logger.error(f"Invalid limit: {limit}")
+            return jsonify({'error': 'Invalid limit'}), 400
+        
+        articles = news_store.get_articles(company, COMPANIES[company], limit=int(limit))
+        sentiment = sentiment_scorer.company_sentiment(articles)
+        return jsonify({
+            'success': True,
+            'symbol': company,
+            **sentiment
+        })
+    except Exception as e:
+        logger.error(f"Error scoring news sentiment: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/analysis/<company>', methods=['GET'])
+@admission.limit('analysis')
 def get_market_analysis(company):
     logger.info(f"Received market analysis request for {company}")
     
@@ -81,29 +341,15 @@ def get_market_analysis(company):
         return jsonify({'error': 'Company not found'}), 404
     
     try:
-        # Get period from query parameters, default to 5d
-        period = request.args.get('period', '5d')
-        if period not in ['1d', '5d', '1mo', '3mo', '1y']:
-            logger.error(f"Invalid period: {period}")
-            return jsonify({'error': 'Invalid period'}), 400
+        try:
+            period = parse_period()
+            depth = parse_depth()
+            chart_format, max_points = parse_chart_options()
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
             
-        logger.info(f"Fetching news for {company}")
-        # Get news first
-        news = newsapi.get_everything(
-            q=COMPANIES[company],
-            language='en',
-            sort_by='publishedAt',
-            page_size=5
-        )
-        
-        logger.info(f"Getting market analysis for {company} with period {period}")
-        # Get market analysis
-        analysis = market_analyst.analyze_market(
-            company_name=COMPANIES[company],
-            symbol=company,
-            news_articles=news['articles'],
-            period=period
-        )
+        analysis = run_market_analysis(company, period, chart_format, max_points, request_deadline(), depth)
         
         logger.info("Analysis completed successfully")
         return jsonify(analysis)
@@ -112,6 +358,7 @@ def get_market_analysis(company):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ask/<company>', methods=['POST'])
+@admission.limit('ask')
 def ask_question(company):
     logger.info(f"Received question for {company}")
     
@@ -125,15 +372,19 @@ def ask_question(company):
         if not data or 'question' not in data:
             logger.error("No question provided")
             return jsonify({'error': 'No question provided'}), 400
+        
+        try:
+            chart_format, max_points = parse_chart_options()
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
             
+        deadline = request_deadline()
+        omitted_sources = []
+        
         logger.info(f"Fetching news for {company}")
-        # Get news first
-        news = newsapi.get_everything(
-            q=COMPANIES[company],
-            language='en',
-            sort_by='publishedAt',
-            page_size=5
-        )
+        # Get the whole stored window; retrieval picks what is relevant
+        news_articles = fetch_news_within(deadline, company, app.config['NEWS_WINDOW_SIZE'], omitted_sources)
         
         logger.info("Asking AI the question")
         # Ask the question
@@ -141,8 +392,13 @@ def ask_question(company):
             company_name=COMPANIES[company],
             symbol=company,
             question=data['question'],
-            news_articles=news['articles']
+            news_articles=news_articles,
+            chart_format=chart_format,
+            max_points=max_points,
+            deadline=deadline
         )
+        if answer.get('success'):
+            answer['omitted_sources'] = omitted_sources + answer['omitted_sources']
         
         logger.info("Question answered successfully")
         return jsonify(answer)
@@ -150,7 +406,67 @@ def ask_question(company):
         logger.error(f"Error processing question: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/compare', methods=['GET'])
+@admission.limit('compare')
+def compare_companies():
+    logger.info("Received comparison request")
+    
+    symbols = list(dict.fromkeys(
+        symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()
+    ))
+    unknown = [symbol for symbol in symbols if symbol not in COMPANIES]
+    if unknown:
+        logger.error(f"Companies not found: {unknown}")
+        return jsonify({'error': f"Company not found: {', '.join(unknown)}"}), 404
+    if len(symbols) < 2:
+        logger.error("Comparison needs at least two symbols")
+        return jsonify({'error': 'Provide at least two comma-separated symbols'}), 400
+    
+    try:
+        try:
+            period = parse_period()
+            chart_format, max_points = parse_chart_options()
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
+        
+        deadline = request_deadline()
+        omitted_sources = []
+        
+        logger.info(f"Fetching news for {', '.join(symbols)}")
+        news_deadline = deadline.slice(max_seconds=app.config['NEWS_BUDGET_SECONDS'])
+        news_futures = {
+            symbol: start_within(news_deadline, "news", "compare", news_store.get_articles,
+                                 symbol, COMPANIES[symbol], app.config['NEWS_WINDOW_SIZE'])
+            for symbol in symbols
+        }
+        news_by_symbol = {}
+        for symbol, future in news_futures.items():
+            try:
+                news_by_symbol[symbol] = wait_within(news_deadline, "news", future)
+            except DeadlineExceeded as e:
+                logger.warning(f"Omitting news for {symbol}: {str(e)}")
+                omitted_sources.append(f"news:{symbol}")
+        
+        comparison = market_analyst.compare_companies(
+            companies=[(symbol, COMPANIES[symbol]) for symbol in symbols],
+            news_by_symbol=news_by_symbol,
+            period=period,
+            chart_format=chart_format,
+            max_points=max_points,
+            deadline=deadline
+        )
+        if comparison.get('success'):
+            comparison['omitted_sources'] = omitted_sources + comparison['omitted_sources']
+        
+        logger.info("Comparison completed successfully")
+        return jsonify(comparison)
+    except Exception as e:
+        logger.error(f"Error comparing companies: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/research/<company>', methods=['GET'])
+@admission.limit('research')
 def get_company_research(company):
     logger.info(f"Received research request for {company}")
     
@@ -166,7 +482,111 @@ def get_company_research(company):
         logger.error(f"Error getting research: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+def job_response(job, status_code=202):
+    """Serialize a job's status with links to poll it."""
+    return jsonify({
+        **job,
+        'status_url': f"/api/jobs/{job['id']}",
+        'result_url': f"/api/jobs/{job['id']}/result"
+    }), status_code
+
+@app.route('/api/jobs/research/<company>', methods=['POST'])
+def submit_research_job(company):
+    logger.info(f"Received research job for {company}")
+    
+    if company not in COMPANIES:
+        logger.error(f"Company not found: {company}")
+        return jsonify({'error': 'Company not found'}), 404
+    
+    try:
+        job = job_manager.submit(
+            f"research:{company}",
+            company_research.get_company_research, company, COMPANIES[company]
+        )
+        return job_response(job)
+    except JobQueueFull as e:
+        logger.warning(str(e))
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error submitting research job: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/analysis/<company>', methods=['POST'])
+def submit_analysis_job(company):
+    logger.info(f"Received analysis job for {company}")
+    
+    if company not in COMPANIES:
+        logger.error(f"Company not found: {company}")
+        return jsonify({'error': 'Company not found'}), 404
+    
+    try:
+        try:
+            period = parse_period()
+            depth = parse_depth()
+            chart_format, max_points = parse_chart_options()
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
+        
+        job = job_manager.submit(
+            f"analysis:{company}:{period}:{depth}:{chart_format}:{max_points}",
+            run_market_analysis, company, period, chart_format, max_points, None, depth
+        )
+        return job_response(job)
+    except JobQueueFull as e:
+        logger.warning(str(e))
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error submitting analysis job: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return job_response(job, 200)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = job_manager.get_result(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'succeeded':
+        # Not done yet: report status so the client keeps polling
+        del job['result']
+        return job_response(job)
+    return jsonify(job['result'])
+
+@app.route('/api/admin/profiler', methods=['GET'])
+def get_profiler_status():
+    if not profiling_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({
+        'running': sampling_profiler.running,
+        'output_dir': sampling_profiler.output_dir,
+        'interval': sampling_profiler.interval
+    })
+
+@app.route('/api/admin/profiler/<action>', methods=['POST'])
+def control_profiler(action):
+    if not profiling_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if action == 'start':
+        sampling_profiler.start()
+        return jsonify({'running': True})
+    if action == 'stop':
+        path = sampling_profiler.stop()
+        return jsonify({'running': False, 'written': path})
+    if action == 'flush':
+        return jsonify({'running': sampling_profiler.running, 'written': sampling_profiler.flush()})
+    return jsonify({'error': 'Unknown action'}), 400
+
 @app.route('/api/search', methods=['GET'])
+@admission.limit('search')
 def search_filings():
     logger.info("Received filings search request")
     try:
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from deadline import Deadline, DeadlineExceeded
+
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry and single-flight loads.
+
+    Concurrent get_or_load calls for a key that is already being loaded wait
+    for that load instead of starting their own, so a background prefetch and
+    the request that needs the data share one upstream fetch. Loaders run
+    with their caller's deadline; if a load fails with DeadlineExceeded, a
+    waiter that still has time takes the load over instead of inheriting the
+    owner's timeout.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, tuple] = {}
+        self._in_flight: Dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+    def is_loading(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._in_flight
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[stale_key]
+        if len(self._entries) >= self.max_entries:
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        self._entries[key] = (now + self.ttl, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    deadline: Optional[Deadline] = None,
+                    should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Return the cached value for key, loading it with loader() if needed.
+
+        Args:
+            key: Cache key
+            loader: Called without arguments to produce the value on a miss
+            deadline: Optional deadline for waiting on another caller's load, and
+                for taking it over if that load ran out of time
+            should_cache: Predicate deciding whether a loaded value is stored
+                (e.g. to skip failed or partial results)
+
+        Raises:
+            DeadlineExceeded: If another caller's load does not finish in time
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    return entry[1]
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    # Mark running so a waiter giving up cannot cancel it for everyone
+                    future.set_running_or_notify_cancel()
+                    self._in_flight[key] = future
+
+            if owner:
+                break
+            try:
+                return future.result(timeout=deadline.remaining() if deadline is not None else None)
+            except FutureTimeoutError:
+                if future.done():
+                    raise
+                raise DeadlineExceeded(f"Load of {key} did not finish within the deadline")
+            except DeadlineExceeded:
+                # The owner ran out of its own time; load again within ours
+                if deadline is not None:
+                    deadline.check(f"loading {key}")
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if should_cache(value):
+                self._store(key, value)
+            self._in_flight.pop(key, None)
+        future.set_result(value)
+        return value
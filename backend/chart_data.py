@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Union
+
+CHART_FORMATS = ('rows', 'columnar')
+
+
+def _epoch_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Convert a (possibly tz-aware) DatetimeIndex to UTC epoch seconds."""
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.to_numpy().astype('datetime64[s]').astype('int64')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select point indices using Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, for every bucket in between, the point
+    forming the largest triangle with the previously selected point and the
+    average of the next bucket, which preserves the visual shape of the series.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[previous] - avg_x) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
+
+
+def build_chart_data(hist: pd.DataFrame,
+                     chart_format: str = 'rows',
+                     max_points: Optional[int] = None) -> Union[List[Dict[str, Any]], Dict[str, List[Any]]]:
+    """Encode price history for the chart, optionally downsampled to max_points.
+
+    Args:
+        hist: Price history as returned by yfinance (DatetimeIndex, Close, Volume)
+        chart_format: 'rows' for a list of per-bar dicts, 'columnar' for parallel
+            arrays keyed by column with epoch-second timestamps
+        max_points: Optional target number of points for LTTB downsampling
+    """
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format: {chart_format}")
+
+    closes = hist['Close'].to_numpy(dtype=float)
+    timestamps = _epoch_seconds(hist.index)
+
+    if max_points and max_points < len(hist):
+        hist = hist.iloc[lttb_indices(timestamps, closes, max_points)]
+        closes = hist['Close'].to_numpy(dtype=float)
+        timestamps = _epoch_seconds(hist.index)
+
+    prices = np.round(closes, 2).tolist()
+    # yfinance reports NaN volume for partial bars; casting NaN to int64 gives garbage
+    volumes = hist['Volume'].fillna(0).to_numpy(dtype='int64').tolist()
+
+    if chart_format == 'columnar':
+        return {
+            "timestamps": timestamps.tolist(),
+            "price": prices,
+            "volume": volumes
+        }
+
+    dates = hist.index.strftime("%Y-%m-%d %H:%M")
+    return [
+        {"date": date, "price": price, "volume": volume}
+        for date, price, volume in zip(dates, prices, volumes)
+    ]
@@ -1,20 +1,96 @@
 import os
 import logging
-from datetime import datetime, timedelta
 from sec_api import ExtractorApi, QueryApi
 from typing import Dict, List, Any, Optional
 import re
+from deadline import Deadline, DeadlineExceeded, run_within
 
 class CompanyResearch:
-    def __init__(self):
+    def __init__(self, retrieval_index=None, filing_store=None, research_cache=None,
+                 trends_budget_fraction=0.8):
         self.logger = logging.getLogger(__name__)
+        self.retrieval_index = retrieval_index
+        self.filing_store = filing_store
+        self.research_cache = research_cache
+        # Share of the remaining deadline quarterly trends may use, so the
+        # filing summary still comes back in time when they are slow
+        self.trends_budget_fraction = trends_budget_fraction
         sec_api_key = os.getenv('SEC_API_KEY')
         if not sec_api_key:
             self.logger.warning("SEC_API_KEY not found in environment variables")
         self.sec_api = QueryApi(api_key=sec_api_key) if sec_api_key else None
 
-    def get_company_research(self, symbol: str, company_name: str) -> Dict[str, Any]:
-        """Get comprehensive research data for a company."""
+    def get_company_research(self, symbol: str, company_name: str,
+                             deadline: Optional[Deadline] = None,
+                             trends_pool: str = 'sec_trends') -> Dict[str, Any]:
+        """Get comprehensive research data for a company.
+        
+        Filings and quarterly trends are cached separately, so a caller that
+        joins a slower load of the trends (e.g. a prefetch without a deadline)
+        still gets the filings when the trends are not ready in time.
+        
+        Args:
+            symbol: Company ticker symbol
+            company_name: Company name used in the filing summary
+            deadline: Optional deadline; quarterly trends are left out (and listed
+                in omitted_sources) when they do not finish before it
+            trends_pool: Deadline pool quarterly trends run on; must not be the
+                pool this call itself runs on
+        """
+        try:
+            research = self._cached(
+                ('filings', symbol),
+                lambda: self._load_filings(symbol, company_name, deadline),
+                deadline
+            )
+        except DeadlineExceeded as e:
+            return self._omitted_research(symbol, e)
+        if not research.get('success'):
+            return research
+
+        # Get quarterly trends analysis
+        omitted_sources = []
+        trends_deadline = deadline.slice(self.trends_budget_fraction) if deadline is not None else None
+        try:
+            quarterly_trends = run_within(trends_deadline, "quarterly trends", trends_pool,
+                                          self._quarterly_trends, symbol, trends_deadline)
+        except DeadlineExceeded as e:
+            self.logger.warning(f"Omitting quarterly trends for {symbol}: {str(e)}")
+            quarterly_trends = {}
+            omitted_sources.append("quarterly_trends")
+
+        return {
+            **research,
+            "quarterly_trends": quarterly_trends if quarterly_trends.get('success') else None,
+            "omitted_sources": omitted_sources
+        }
+
+    def _cached(self, key: tuple, loader, deadline: Optional[Deadline]) -> Dict[str, Any]:
+        """Load through the research cache when there is one; failed results are not cached."""
+        if self.research_cache is None:
+            return loader()
+        return self.research_cache.get_or_load(
+            key, loader, deadline, should_cache=lambda result: bool(result.get('success'))
+        )
+
+    def _quarterly_trends(self, symbol: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        return self._cached(
+            ('trends', symbol),
+            lambda: self.analyze_quarterly_trends(symbol, 4, deadline),
+            deadline
+        )
+
+    def _omitted_research(self, symbol: str, error: Exception) -> Dict[str, Any]:
+        self.logger.warning(f"Omitting SEC filings for {symbol}: {str(error)}")
+        return {
+            "success": False,
+            "filing_summary": "SEC filing data omitted - not available in time",
+            "omitted_sources": ["sec_research"]
+        }
+
+    def _load_filings(self, symbol: str, company_name: str,
+                      deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Fetch and summarize recent filings for get_company_research."""
         try:
             if not self.sec_api:
                 self.logger.warning("SEC API not initialized - missing API key")
@@ -23,23 +99,10 @@ class CompanyResearch:
                     "filing_summary": "SEC filing data unavailable - API key not configured"
                 }
 
-            # Get SEC filings from the last year
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=365)
-            
-            query = {
-                "query": {
-                    "query_string": {
-                        "query": f"ticker:{symbol} AND (formType:\"10-K\" OR formType:\"10-Q\" OR formType:\"8-K\")",
-                        "time_zone": "America/New_York"
-                    }
-                },
-                "from": "0",
-                "size": "50",
-                "sort": [{"filedAt": {"order": "desc"}}]
-            }
-
-            filings = self.sec_api.get_filings(query)
+            # Runs inline: callers with a deadline already run this on the 'sec' pool
+            if deadline is not None:
+                deadline.check("SEC filings query")
+            filings = self._recent_filings(symbol, ['10-K', '10-Q', '8-K'], 50)
             
             # Organize filings by type with enhanced metadata
             organized_filings = {
@@ -48,7 +111,7 @@ class CompanyResearch:
                 '8-K': []
             }
 
-            for filing in filings.get('filings', []):
+            for filing in filings:
                 form_type = filing.get('formType', '')
                 if form_type in organized_filings:
                     # Enhanced filing metadata
@@ -72,16 +135,15 @@ class CompanyResearch:
             # Generate a summary of recent filings
             filing_summary = self._generate_filing_summary(organized_filings, company_name)
 
-            # Get quarterly trends analysis
-            quarterly_trends = self.analyze_quarterly_trends(symbol)
-
             return {
                 "success": True,
                 "sec_filings": organized_filings,
-                "filing_summary": filing_summary,
-                "quarterly_trends": quarterly_trends if quarterly_trends.get('success') else None
+                "filing_summary": filing_summary
             }
 
+        except DeadlineExceeded:
+            # Handled in get_company_research, so cache waiters can retry the load
+            raise
         except Exception as e:
             self.logger.error(f"Error fetching SEC data for {symbol}: {str(e)}")
             return {
@@ -89,6 +151,29 @@ class CompanyResearch:
                 "filing_summary": f"Unable to fetch SEC filings at this time: {str(e)}"
             }
 
+    def _recent_filings(self, symbol: str, form_types: List[str], limit: int) -> List[Dict[str, Any]]:
+        """Get a company's most recent filings of the given types, newest first.
+        
+        Reads the local filing mirror when one is configured and queries
+        SEC-API directly otherwise.
+        """
+        if self.filing_store:
+            return self.filing_store.get_filings(symbol, form_types=form_types, limit=limit)
+
+        forms = " OR ".join(f'formType:"{form_type}"' for form_type in form_types)
+        query = {
+            "query": {
+                "query_string": {
+                    "query": f"ticker:{symbol} AND ({forms})",
+                    "time_zone": "America/New_York"
+                }
+            },
+            "from": "0",
+            "size": str(limit),
+            "sort": [{"filedAt": {"order": "desc"}}]
+        }
+        return self.sec_api.get_filings(query).get('filings', [])
+
     def _extract_documents(self, filing: Dict[str, Any]) -> List[Dict[str, str]]:
         """Extract important documents from a filing."""
         documents = []
@@ -189,7 +274,11 @@ class CompanyResearch:
             }
 
             # Add optional filters
-            if company_symbol:
+            if company_symbol and self.filing_store:
+                cik = self.filing_store.get_cik(company_symbol)
+                if cik:
+                    search_request["ciks"] = [cik]
+            elif company_symbol:
                 # Get CIK for the company if symbol is provided
                 cik_query = {
                     "query": {
@@ -235,7 +324,7 @@ class CompanyResearch:
                 
                 # For 10-Q filings, extract quarterly highlights
                 if filing.get('formType') == '10-Q' and filing.get('filingUrl'):
-                    highlights = self.extract_quarterly_highlights(filing.get('filingUrl'))
+                    highlights = self.extract_quarterly_highlights(filing.get('filingUrl'), filing.get('ticker'))
                     if highlights.get('success'):
                         result['quarterlyHighlights'] = highlights
                 
@@ -255,11 +344,15 @@ class CompanyResearch:
                 "error": f"Failed to perform full-text search: {str(e)}"
             }
 
-    def extract_quarterly_highlights(self, filing_url: str) -> Dict[str, Any]:
+    def extract_quarterly_highlights(self, filing_url: str, symbol: Optional[str] = None,
+                                     deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Extract key financial metrics and highlights from a 10-Q filing.
         
         Args:
             filing_url: URL to the SEC filing
+            symbol: Optional ticker symbol; when given, the extracted sections are
+                added to the retrieval index for that company
+            deadline: Optional deadline checked before each ExtractorApi call
             
         Returns:
             Dictionary containing key financial metrics and highlights
@@ -271,10 +364,22 @@ class CompanyResearch:
             # Initialize ExtractorApi for getting specific sections
             extractor_api = ExtractorApi(api_key=self.sec_api.api_key)
             
+            def get_section(item):
+                if deadline is not None:
+                    deadline.check(f"extracting {item} of {filing_url}")
+                return extractor_api.get_section(filing_url, item, "text")
+            
             # Get key sections from the 10-Q
-            md_and_a = extractor_api.get_section(filing_url, "part1item2", "text")  # Management Discussion & Analysis
-            risk_factors = extractor_api.get_section(filing_url, "part2item1a", "text")  # Risk Factors
-            financial_statements = extractor_api.get_section(filing_url, "part1item1", "text")  # Financial Statements
+            md_and_a = get_section("part1item2")  # Management Discussion & Analysis
+            risk_factors = get_section("part2item1a")  # Risk Factors
+            financial_statements = get_section("part1item1")  # Financial Statements
+            
+            if self.retrieval_index and symbol:
+                self._index_sections(symbol, filing_url, {
+                    "Management Discussion & Analysis": md_and_a,
+                    "Risk Factors": risk_factors,
+                    "Financial Statements": financial_statements
+                })
             
             # Extract key metrics using regex patterns
             metrics = {
@@ -305,6 +410,8 @@ class CompanyResearch:
                 "success": True
             }
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             self.logger.error(f"Error extracting quarterly highlights: {str(e)}")
             return {
@@ -312,6 +419,22 @@ class CompanyResearch:
                 "error": f"Failed to extract quarterly highlights: {str(e)}"
             }
             
+    def _index_sections(self, symbol: str, filing_url: str, sections: Dict[str, str]) -> None:
+        """Add extracted 10-Q sections to the retrieval index."""
+        try:
+            self.retrieval_index.add_documents(symbol, [
+                {
+                    'id': f"{filing_url}#{title}",
+                    'source': '10-Q',
+                    'title': title,
+                    'date': '',
+                    'text': text
+                }
+                for title, text in sections.items() if text
+            ])
+        except Exception as e:
+            self.logger.error(f"Error indexing 10-Q sections for {symbol}: {str(e)}")
+
     def _extract_metric(self, text: str, pattern: str) -> Optional[str]:
         """Helper method to extract financial metrics using regex patterns."""
         if not text:
@@ -322,12 +445,16 @@ class CompanyResearch:
             return match.group(1)
         return None
 
-    def analyze_quarterly_trends(self, symbol: str, num_quarters: int = 4) -> Dict[str, Any]:
+    def analyze_quarterly_trends(self, symbol: str, num_quarters: int = 4,
+                                 deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Analyze trends across multiple quarterly reports.
         
         Args:
             symbol: Company ticker symbol
             num_quarters: Number of recent quarters to analyze
+            deadline: Optional deadline; once it passes no further filings are
+                extracted and DeadlineExceeded is raised, so a caller that has
+                stopped waiting does not leave the extraction running
             
         Returns:
             Dictionary containing quarterly metrics and trend analysis
@@ -337,25 +464,15 @@ class CompanyResearch:
                 return {"error": "SEC API not initialized"}
 
             # Get recent 10-Q filings
-            query = {
-                "query": {
-                    "query_string": {
-                        "query": f"ticker:{symbol} AND formType:\"10-Q\"",
-                        "time_zone": "America/New_York"
-                    }
-                },
-                "from": "0",
-                "size": str(num_quarters),
-                "sort": [{"filedAt": {"order": "desc"}}]
-            }
-
-            filings = self.sec_api.get_filings(query)
+            filings = self._recent_filings(symbol, ['10-Q'], num_quarters)
             
             # Extract metrics from each quarterly report
             quarterly_data = []
-            for filing in filings.get('filings', []):
-                if filing.get('filingUrl'):
-                    highlights = self.extract_quarterly_highlights(filing.get('filingUrl'))
+            for filing in filings:
+                # QueryApi results (and the filing mirror) link the document as linkToFilingDetails
+                filing_url = filing.get('linkToFilingDetails') or filing.get('filingUrl')
+                if filing_url:
+                    highlights = self.extract_quarterly_highlights(filing_url, symbol, deadline)
                     if highlights.get('success') and highlights.get('metrics'):
                         quarterly_data.append({
                             'quarter': filing.get('periodOfReport', '').split('T')[0],
@@ -394,6 +511,8 @@ class CompanyResearch:
                 "summary": self._generate_trend_summary(trends)
             }
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             self.logger.error(f"Error analyzing quarterly trends: {str(e)}")
             return {
@@ -16,12 +16,111 @@ class Config:
     # CORS settings
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'https://signal7.vercel.app').split(',')
     
+    # Response compression and chart payloads
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+    CHART_MAX_POINTS_LIMIT = int(os.getenv('CHART_MAX_POINTS_LIMIT', '2000'))
+    
+    # Local SEC filing metadata mirror
+    FILING_DB_PATH = os.getenv('FILING_DB_PATH', os.path.join(os.path.dirname(__file__), 'filings.db'))
+    FILING_SYNC_INTERVAL = int(os.getenv('FILING_SYNC_INTERVAL', '900'))
+    
+    # Process caches and speculative prefetch of analysis inputs
+    HISTORY_CACHE_TTL = int(os.getenv('HISTORY_CACHE_TTL', '60'))
+    RESEARCH_CACHE_TTL = int(os.getenv('RESEARCH_CACHE_TTL', '900'))
+    PREFETCH_MAX_IN_FLIGHT = int(os.getenv('PREFETCH_MAX_IN_FLIGHT', '2'))
+    PREFETCH_MIN_INTERVAL = int(os.getenv('PREFETCH_MIN_INTERVAL', '60'))
+    
+    # Request deadlines (keep below the load balancer / gunicorn timeout)
+    REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '25'))
+    NEWS_BUDGET_SECONDS = float(os.getenv('NEWS_BUDGET_SECONDS', '5'))
+    SEC_BUDGET_FRACTION = float(os.getenv('SEC_BUDGET_FRACTION', '0.5'))
+    
+    # LLM model tiers (cost per 1k tokens is used for the estimated cost reported
+    # with each answer) and per-route latency SLOs (seconds)
+    LLM_FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'gpt-4o-mini')
+    LLM_FAST_EXPECTED_LATENCY = float(os.getenv('LLM_FAST_EXPECTED_LATENCY', '4'))
+    LLM_FAST_COST_PER_1K = float(os.getenv('LLM_FAST_COST_PER_1K', '0.0006'))
+    LLM_DEEP_MODEL = os.getenv('LLM_DEEP_MODEL', 'gpt-4o')
+    LLM_DEEP_EXPECTED_LATENCY = float(os.getenv('LLM_DEEP_EXPECTED_LATENCY', '12'))
+    LLM_DEEP_COST_PER_1K = float(os.getenv('LLM_DEEP_COST_PER_1K', '0.01'))
+    LLM_ROUTES = {
+        'ask': {'slo': float(os.getenv('LLM_ASK_SLO', '15')), 'tier': 'fast'},
+        'analysis': {'slo': float(os.getenv('LLM_ANALYSIS_SLO', '20')), 'tier': 'deep'},
+        'analysis_summary': {'slo': float(os.getenv('LLM_ANALYSIS_SUMMARY_SLO', '8')), 'tier': 'fast'},
+        'compare': {'slo': float(os.getenv('LLM_COMPARE_SLO', '20')), 'tier': 'deep'},
+    }
+    
+    # Admission control for expensive endpoints. Each queued request holds a
+    # server thread, so ADMISSION_THREAD_BUDGET caps admitted plus queued
+    # requests and must stay below the server's thread count (gunicorn
+    # --threads) for cheap routes to always find a worker.
+    ADMISSION_LIMITS = {
+        'analysis': {
+            'concurrency': int(os.getenv('ADMISSION_ANALYSIS_CONCURRENCY', '4')),
+            'queue': int(os.getenv('ADMISSION_ANALYSIS_QUEUE', '8')),
+            'queue_timeout': float(os.getenv('ADMISSION_ANALYSIS_QUEUE_TIMEOUT', '5'))
+        },
+        'ask': {
+            'concurrency': int(os.getenv('ADMISSION_ASK_CONCURRENCY', '4')),
+            'queue': int(os.getenv('ADMISSION_ASK_QUEUE', '8')),
+            'queue_timeout': float(os.getenv('ADMISSION_ASK_QUEUE_TIMEOUT', '5'))
+        },
+        'compare': {
+            'concurrency': int(os.getenv('ADMISSION_COMPARE_CONCURRENCY', '2')),
+            'queue': int(os.getenv('ADMISSION_COMPARE_QUEUE', '2')),
+            'queue_timeout': float(os.getenv('ADMISSION_COMPARE_QUEUE_TIMEOUT', '5'))
+        },
+        'research': {
+            'concurrency': int(os.getenv('ADMISSION_RESEARCH_CONCURRENCY', '2')),
+            'queue': int(os.getenv('ADMISSION_RESEARCH_QUEUE', '4')),
+            'queue_timeout': float(os.getenv('ADMISSION_RESEARCH_QUEUE_TIMEOUT', '5'))
+        },
+        'search': {
+            'concurrency': int(os.getenv('ADMISSION_SEARCH_CONCURRENCY', '2')),
+            'queue': int(os.getenv('ADMISSION_SEARCH_QUEUE', '4')),
+            'queue_timeout': float(os.getenv('ADMISSION_SEARCH_QUEUE_TIMEOUT', '5'))
+        },
+    }
+    ADMISSION_EXPENSIVE_TOTAL = int(os.getenv('ADMISSION_EXPENSIVE_TOTAL', '8'))
+    ADMISSION_THREAD_BUDGET = int(os.getenv('ADMISSION_THREAD_BUDGET', '12'))
+    
+    # Background jobs
+    JOB_MAX_WORKERS = int(os.getenv('JOB_MAX_WORKERS', '4'))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '32'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '600'))
+    
+    # Rolling news store
+    NEWS_WINDOW_SIZE = int(os.getenv('NEWS_WINDOW_SIZE', '100'))
+    NEWS_REFRESH_INTERVAL = int(os.getenv('NEWS_REFRESH_INTERVAL', '300'))
+    
+    # Local news sentiment scoring (scores cached by article URL)
+    SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', '10000'))
+    SENTIMENT_NEUTRAL_BAND = float(os.getenv('SENTIMENT_NEUTRAL_BAND', '0.05'))
+    
+    # Retrieval index for Q&A context
+    RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '6'))
+    RETRIEVAL_CHUNK_SIZE = int(os.getenv('RETRIEVAL_CHUNK_SIZE', '800'))
+    RETRIEVAL_MAX_CHUNKS = int(os.getenv('RETRIEVAL_MAX_CHUNKS', '2000'))
+    
+    # Profiling: per-request call trees (?profile=1) need PROFILING_ENABLED or
+    # the X-Admin-Token header; the sampling profiler writes folded stacks
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    PROFILING_ENABLED = False
+    SAMPLING_PROFILER_ENABLED = os.getenv('SAMPLING_PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SAMPLING_PROFILER_INTERVAL = float(os.getenv('SAMPLING_PROFILER_INTERVAL', '0.05'))
+    SAMPLING_PROFILER_FLUSH_INTERVAL = float(os.getenv('SAMPLING_PROFILER_FLUSH_INTERVAL', '60'))
+    SAMPLING_PROFILER_FILE_PERIOD = float(os.getenv('SAMPLING_PROFILER_FILE_PERIOD', '3600'))
+    SAMPLING_PROFILER_MAX_FILES = int(os.getenv('SAMPLING_PROFILER_MAX_FILES', '48'))
+    PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+    
     # Rate limiting
     RATELIMIT_DEFAULT = "100 per day"
     RATELIMIT_STORAGE_URL = os.getenv('REDIS_URL', 'memory://')
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    PROFILING_ENABLED = True
     CORS_ORIGINS = ['http://localhost:3000', 'http://localhost:3001', 'http://localhost:3002']
 
 class ProductionConfig(Config):
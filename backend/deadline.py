@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+# Upstream calls that must respect a deadline run on a pool per upstream so the
+# caller can stop waiting. A call that overruns keeps its thread until it
+# returns on its own, so separate pools keep a slow upstream from starving
+# calls to the others. A task never waits on work queued to its own pool.
+POOL_SIZES = {
+    'news': 8,
+    'sec': 8,
+    'sec_trends': 8,
+    # Every fetch of /api/compare (news, stock data and SEC research for each
+    # symbol, and the research's quarterly trends), so a wide comparison
+    # queues behind itself instead of starving the pools other requests use
+    'compare': 12,
+    'compare_trends': 8,
+}
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(name: str) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=f'deadline-{name}')
+        return _pools[name]
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call does not finish within its deadline."""
+
+
+class Deadline:
+    """Absolute point in time by which a request has to be answered."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, what: str) -> None:
+        """Raise DeadlineExceeded if the deadline has already passed."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before {what}")
+
+    def slice(self, fraction: float = 1.0, max_seconds: Optional[float] = None) -> 'Deadline':
+        """Return a child deadline for a share of the remaining budget."""
+        seconds = self.remaining() * fraction
+        if max_seconds is not None:
+            seconds = min(seconds, max_seconds)
+        return Deadline(seconds)
+
+
+def start_within(deadline: Optional[Deadline], what: str, pool: str,
+                 fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """Start fn(*args, **kwargs) on the named pool; collect it with wait_within."""
+    if deadline is not None:
+        deadline.check(what)
+    return _pool(pool).submit(fn, *args, **kwargs)
+
+
+def wait_within(deadline: Optional[Deadline], what: str, future: Future) -> Any:
+    """Wait for a started call, giving up once the deadline passes.
+
+    Raises:
+        DeadlineExceeded: If the call has not returned by the deadline
+    """
+    try:
+        return future.result(timeout=deadline.remaining() if deadline is not None else None)
+    except FutureTimeoutError:
+        if future.done():
+            # The call itself raised a TimeoutError
+            raise
+        future.cancel()
+        raise DeadlineExceeded(f"{what} did not finish within the deadline")
+
+
+def run_within(deadline: Optional[Deadline], what: str, pool: str,
+               fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run fn(*args, **kwargs) on the named pool, giving up once the deadline passes.
+
+    With no deadline, fn is simply called in the current thread.
+
+    Raises:
+        DeadlineExceeded: If fn has not returned by the deadline
+    """
+    if deadline is None:
+        return fn(*args, **kwargs)
+    return wait_within(deadline, what, start_within(deadline, what, pool, fn, *args, **kwargs))
@@ -0,0 +1,232 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from sec_api import QueryApi
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS filings (
+    accession_no TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    cik TEXT,
+    form_type TEXT NOT NULL,
+    filed_at TEXT NOT NULL,
+    period_of_report TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_filings_ticker_form_filed
+    ON filings (ticker, form_type, filed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_filings_ticker_filed
+    ON filings (ticker, filed_at DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    ticker TEXT PRIMARY KEY,
+    last_synced_at REAL NOT NULL
+);
+"""
+
+
+class FilingStore:
+    """Local SQLite mirror of SEC filing metadata for tracked tickers.
+
+    Each sync asks QueryApi only for filings filed on or after the latest
+    stored filedAt for the ticker (filings already stored are upserted by
+    accession number), so steady-state syncs fetch a page or less. Readers
+    query the mirror with indexed lookups by ticker, form type and date and
+    get back the filing dicts exactly as QueryApi returned them.
+    """
+
+    def __init__(self, db_path: str, api_key: str,
+                 form_types: tuple = ('10-K', '10-Q', '8-K'),
+                 page_size: int = 50, max_pages: int = 10,
+                 initial_lookback_days: int = 730, stale_after: int = 900,
+                 retry_interval: int = 60):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = db_path
+        self.query_api = QueryApi(api_key=api_key)
+        self.form_types = form_types
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.initial_lookback_days = initial_lookback_days
+        self.stale_after = stale_after
+        self.retry_interval = retry_interval
+        self._failed_at: Dict[str, float] = {}
+        self._sync_locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _sync_lock(self, ticker: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._sync_locks.setdefault(ticker, threading.Lock())
+
+    def latest_filed_at(self, ticker: str) -> Optional[str]:
+        """Return the newest stored filedAt for a ticker, or None if nothing is stored."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT MAX(filed_at) AS filed_at FROM filings WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row['filed_at']
+
+    def last_synced_at(self, ticker: str) -> Optional[float]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT last_synced_at FROM sync_state WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        return row['last_synced_at'] if row else None
+
+    def sync(self, ticker: str) -> int:
+        """Fetch filings for a ticker newer than the latest stored one.
+
+        Returns:
+            Number of filings received and upserted
+        """
+        with self._sync_lock(ticker):
+            latest = self.latest_filed_at(ticker)
+            # filedAt ranges are inclusive by day; the overlap is upserted away
+            since = latest[:10] if latest else (
+                datetime.now() - timedelta(days=self.initial_lookback_days)
+            ).strftime('%Y-%m-%d')
+            forms = ' OR '.join(f'formType:"{form_type}"' for form_type in self.form_types)
+
+            received = 0
+            for page in range(self.max_pages):
+                response = self.query_api.get_filings({
+                    "query": {
+                        "query_string": {
+                            "query": f"ticker:{ticker} AND ({forms}) AND filedAt:[{since} TO *]",
+                            "time_zone": "America/New_York"
+                        }
+                    },
+                    "from": str(page * self.page_size),
+                    "size": str(self.page_size),
+                    "sort": [{"filedAt": {"order": "desc"}}]
+                })
+                filings = response.get('filings', [])
+                self._upsert(ticker, filings)
+                received += len(filings)
+                if len(filings) < self.page_size:
+                    break
+
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (ticker, last_synced_at) VALUES (?, ?)",
+                    (ticker, time.time())
+                )
+
+        self.logger.info(f"Synced {received} filings for {ticker} filed since {since}")
+        return received
+
+    def _upsert(self, ticker: str, filings: List[Dict[str, Any]]) -> None:
+        rows = [
+            (
+                filing['accessionNo'],
+                ticker,
+                str(filing.get('cik', '')),
+                filing.get('formType', ''),
+                filing.get('filedAt', ''),
+                filing.get('periodOfReport', ''),
+                json.dumps(filing)
+            )
+            for filing in filings if filing.get('accessionNo')
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO filings "
+                "(accession_no, ticker, cik, form_type, filed_at, period_of_report, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def ensure_synced(self, ticker: str) -> None:
+        """Sync a ticker that has never been synced or whose last sync is stale.
+
+        Tracked tickers are kept fresh by the background sync, so this only
+        reaches SEC-API for untracked tickers or if the background sync stalls.
+        If the sync fails, the stored filings are served and the sync is not
+        retried from the request path for retry_interval seconds; the error is
+        only raised when nothing is stored yet for the ticker.
+        """
+        last_synced_at = self.last_synced_at(ticker)
+        if last_synced_at is not None and time.time() - last_synced_at <= self.stale_after:
+            return
+        failed_at = self._failed_at.get(ticker)
+        if failed_at and time.time() - failed_at < self.retry_interval and self.latest_filed_at(ticker):
+            return
+
+        try:
+            self.sync(ticker)
+            self._failed_at.pop(ticker, None)
+        except Exception as e:
+            self._failed_at[ticker] = time.time()
+            if not self.latest_filed_at(ticker):
+                raise
+            self.logger.error(f"Error syncing filings for {ticker}, serving stored filings: {str(e)}")
+
+    def get_filings(self, ticker: str, form_types: Optional[List[str]] = None,
+                    since: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return stored filings for a ticker, newest first.
+
+        Args:
+            ticker: Company ticker symbol
+            form_types: Optional form types to include
+            since: Optional minimum filedAt (YYYY-MM-DD or full timestamp)
+            limit: Maximum number of filings to return
+        """
+        self.ensure_synced(ticker)
+
+        sql = "SELECT raw FROM filings WHERE ticker = ?"
+        params: List[Any] = [ticker]
+        if form_types:
+            sql += f" AND form_type IN ({', '.join('?' for _ in form_types)})"
+            params.extend(form_types)
+        if since:
+            sql += " AND filed_at >= ?"
+            params.append(since)
+        sql += " ORDER BY filed_at DESC LIMIT ?"
+        params.append(limit)
+
+        with closing(self._connect()) as conn:
+            return [json.loads(row['raw']) for row in conn.execute(sql, params)]
+
+    def get_cik(self, ticker: str) -> Optional[str]:
+        """Return the CIK recorded for a ticker, if any filing is stored."""
+        self.ensure_synced(ticker)
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT cik FROM filings WHERE ticker = ? AND cik != '' LIMIT 1", (ticker,)
+            ).fetchone()
+        return row['cik'] if row else None
+
+    def start_background_sync(self, tickers: List[str], interval: int = 900) -> None:
+        """Delta-sync the given tickers every interval seconds on a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                for ticker in tickers:
+                    try:
+                        self.sync(ticker)
+                    except Exception as e:
+                        self.logger.error(f"Error syncing filings for {ticker}: {str(e)}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name='filing-sync', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Started background filing sync for {', '.join(tickers)} every {interval}s")
+
+    def stop_background_sync(self) -> None:
+        self._stop.set()
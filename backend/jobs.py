@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already pending or running."""
+
+
+class JobManager:
+    """Runs slow work on a bounded background executor instead of request workers.
+
+    Jobs are identified by a key describing the work (e.g. "research:AAPL").
+    Submitting a key that is already pending or running returns the existing
+    job, and a successful result is reused for result_ttl seconds. Finished
+    jobs are forgotten once their TTL has passed.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, result_ttl: int = 600):
+        self.logger = logging.getLogger(__name__)
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, str] = {}
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] and now - job['finished_at'] > self.result_ttl
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._keys.get(job['key']) == job_id:
+                del self._keys[job['key']]
+
+    @staticmethod
+    def _is_reusable(job: Dict[str, Any]) -> bool:
+        if job['status'] in ('pending', 'running'):
+            return True
+        result = job['result']
+        return job['status'] == 'succeeded' and not (isinstance(result, dict) and result.get('success') is False)
+
+    def submit(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Dict[str, Any]:
+        """Submit fn(*args, **kwargs) under key, or return the matching live or cached job.
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already pending or running
+        """
+        with self._lock:
+            self._purge_expired()
+
+            existing = self._jobs.get(self._keys.get(key))
+            if existing and self._is_reusable(existing):
+                return self._public(existing)
+
+            active = sum(1 for job in self._jobs.values() if job['status'] in ('pending', 'running'))
+            if active >= self.max_pending:
+                raise JobQueueFull(f"Too many background jobs ({active}), try again later")
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'key': key,
+                'status': 'pending',
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._jobs[job['id']] = job
+            self._keys[key] = job['id']
+
+        self.logger.info(f"Submitted job {job['id']} for {key}")
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return self._public(job)
+
+    def _run(self, job: Dict[str, Any], fn: Callable[..., Any], args, kwargs) -> None:
+        job['started_at'] = time.time()
+        job['status'] = 'running'
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                job['result'] = result
+                job['status'] = 'succeeded'
+                job['finished_at'] = time.time()
+            self.logger.info(f"Job {job['id']} for {job['key']} finished in "
+                             f"{job['finished_at'] - job['started_at']:.2f}s")
+        except Exception as e:
+            self.logger.error(f"Job {job['id']} for {job['key']} failed: {str(e)}", exc_info=True)
+            with self._lock:
+                job['error'] = str(e)
+                job['status'] = 'failed'
+                job['finished_at'] = time.time()
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key != 'result'}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's status without its result, or None if unknown or expired."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job including its result, or None if unknown or expired."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
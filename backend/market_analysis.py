@@ -1,21 +1,32 @@
 import logging
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import os
 from company_research import CompanyResearch
+from chart_data import build_chart_data
+from retrieval_index import RetrievalIndex
+from deadline import DeadlineExceeded, start_within, wait_within
+from model_router import ModelRouter
+from sentiment import SentimentScorer
+import time
 
 class MarketAnalyst:
-    def __init__(self):
+    def __init__(self, company_research=None, retrieval_index=None, retrieval_top_k=6,
+                 sec_budget_fraction=0.5, model_router=None, history_cache=None,
+                 sentiment_scorer=None):
         # Set up logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
-        self.llm = ChatOpenAI(temperature=0.7)
-        self.company_research = CompanyResearch()
+        self.model_router = model_router or ModelRouter()
+        self.retrieval_index = retrieval_index or RetrievalIndex()
+        self.retrieval_top_k = retrieval_top_k
+        self.sec_budget_fraction = sec_budget_fraction
+        self.history_cache = history_cache
+        self.sentiment_scorer = sentiment_scorer or SentimentScorer()
+        self.company_research = company_research or CompanyResearch(retrieval_index=self.retrieval_index)
         self.analysis_prompt = ChatPromptTemplate.from_template("""
             Analyze the market activity for {company_name} ({symbol}) based on the following data:
             
@@ -29,6 +40,9 @@ class MarketAnalyst:
             Recent News:
             {news_summary}
             
+            News Sentiment (lexicon score of recent articles, -1 to +1):
+            {news_sentiment}
+            
             Recent SEC Filings:
             {sec_summary}
             
@@ -41,16 +55,53 @@ class MarketAnalyst:
             
             Keep the analysis clear, factual, and focused on the most important points.
             """)
-        
-        # Create the analysis chain using LCEL
-        self.chain = self.analysis_prompt | self.llm | StrOutputParser()
+        self.summary_prompt = ChatPromptTemplate.from_template("""
+            Summarize the market activity for {company_name} ({symbol}) based on the following data:
+            
+            Stock Data:
+            - Current Price: ${current_price}
+            - Price Change: {price_change}%
+            - Volume: {volume}
+            - 5-day High: ${high}
+            - 5-day Low: ${low}
+            
+            Recent News:
+            {news_summary}
+            
+            News Sentiment (lexicon score of recent articles, -1 to +1):
+            {news_sentiment}
+            
+            Recent SEC Filings:
+            {sec_summary}
+            
+            Give a brief summary in 3-5 bullet points covering the price move, the most
+            important news or filing, and the overall sentiment.
+            """)
+        self.comparison_prompt = ChatPromptTemplate.from_template("""
+            Compare the following companies ({symbols}) based on their market data,
+            technical indicators, SEC filings and recent news:
+            
+            {company_blocks}
+            
+            Please provide a comparative analysis including:
+            1. Relative price performance and momentum
+            2. How the news and SEC filings differ between the companies
+            3. Relative strengths, weaknesses and risks
+            4. Overall market sentiment towards each company
+            5. Key takeaways for investors choosing between them
+            
+            Keep the comparison clear, factual, and focused on the most important differences.
+            """)
 
-    def get_stock_data(self, symbol, period="5d"):
+    def _fetch_history(self, symbol, period="5d", deadline=None):
+        """Fetch price history and basic market info from Yahoo Finance, with retries."""
         max_retries = 3
         retry_delay = 1  # seconds
         
         for attempt in range(max_retries):
             try:
+                if deadline is not None:
+                    deadline.check(f"fetching stock data for {symbol}")
                 self.logger.info(f"Fetching stock data for {symbol} with period {period} (attempt {attempt + 1}/{max_retries})")
                 stock = yf.Ticker(symbol)
                 
@@ -66,63 +117,89 @@ class MarketAnalyst:
                 
                 # Adjust interval based on period for better data resolution
                 interval = "1h" if period in ["1d", "5d"] else "1d"
-                hist = stock.history(period=period, interval=interval)
+                timeout = min(10, deadline.remaining()) if deadline is not None else 10
+                hist = stock.history(period=period, interval=interval, timeout=timeout)
                 
                 if len(hist) == 0:
                     self.logger.error(f"No data returned for {symbol}")
                     raise ValueError(f"No stock data available for {symbol}")
                 
-                # Get historical data for chart
-                chart_data = []
-                for date, row in hist.iterrows():
-                    chart_data.append({
-                        "date": date.strftime("%Y-%m-%d %H:%M"),
-                        "price": round(row['Close'], 2),
-                        "volume": int(row['Volume'])
-                    })
-                
-                current_price = hist['Close'].iloc[-1]
-                prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
-                price_change = ((current_price - prev_close) / prev_close) * 100
-                
-                # Calculate technical indicators
-                sma_20 = hist['Close'].rolling(window=min(20, len(hist))).mean().iloc[-1]
-                sma_50 = hist['Close'].rolling(window=min(50, len(hist))).mean().iloc[-1]
-                rsi = self._calculate_rsi(hist['Close'])
-                
                 # Use fast_info for basic data to avoid rate limiting
-                market_cap = getattr(info, 'market_cap', 0) or 0
-                
                 return {
-                    "current_price": f"{current_price:.2f}",
-                    "price_change": f"{price_change:.2f}",
-                    "volume": f"{hist['Volume'].iloc[-1]:,}",
-                    "avg_volume": f"{int(hist['Volume'].mean()):,}",
-                    "high": f"{hist['High'].max():.2f}",
-                    "low": f"{hist['Low'].min():.2f}",
-                    "chart_data": chart_data,
-                    "technical_indicators": {
-                        "sma_20": f"{sma_20:.2f}",
-                        "sma_50": f"{sma_50:.2f}",
-                        "rsi": f"{rsi:.2f}",
-                    },
-                    "market_data": {
-                        "market_cap": market_cap,
-                        "pe_ratio": 0,  # Simplified for now
-                        "dividend_yield": 0,
-                        "beta": 0,
-                        "52w_high": getattr(info, 'year_high', 0) or 0,
-                        "52w_low": getattr(info, 'year_low', 0) or 0,
-                    }
+                    "hist": hist,
+                    "market_cap": getattr(info, 'market_cap', 0) or 0,
+                    "year_high": getattr(info, 'year_high', 0) or 0,
+                    "year_low": getattr(info, 'year_low', 0) or 0
                 }
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 self.logger.error(f"Error fetching stock data for {symbol} (attempt {attempt + 1}/{max_retries}): {str(e)}")
+                delay = retry_delay * (attempt + 1)  # Exponential backoff
                 if attempt < max_retries - 1:
-                    import time
-                    time.sleep(retry_delay * (attempt + 1))  # Exponential backoff
+                    # Don't sleep through the rest of the request's budget
+                    if deadline is not None and deadline.remaining() <= delay:
+                        # Report running out of time as such, so a caller sharing
+                        # this load through the cache retries with its own budget
+                        raise DeadlineExceeded(f"No time left to retry stock data for {symbol}: {str(e)}")
+                    time.sleep(delay)
                     continue
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded(f"Stock data for {symbol} did not arrive in time: {str(e)}")
                 raise ValueError(f"Failed to fetch stock data after {max_retries} attempts: {str(e)}")
 
+    def load_history(self, symbol, period="5d", deadline=None):
+        """Get price history through the process cache, sharing any in-flight fetch."""
+        if self.history_cache is None:
+            return self._fetch_history(symbol, period, deadline)
+        return self.history_cache.get_or_load(
+            (symbol, period), lambda: self._fetch_history(symbol, period, deadline), deadline
+        )
+
+    def get_stock_data(self, symbol, period="5d", chart_format="rows", max_points=None, deadline=None):
+        market = self.load_history(symbol, period, deadline)
+        hist = market["hist"]
+        
+        # Get historical data for chart
+        chart_data = build_chart_data(hist, chart_format, max_points)
+        
+        current_price = hist['Close'].iloc[-1]
+        prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
+        price_change = ((current_price - prev_close) / prev_close) * 100
+        
+        # Calculate technical indicators
+        sma_20 = hist['Close'].rolling(window=min(20, len(hist))).mean().iloc[-1]
+        sma_50 = hist['Close'].rolling(window=min(50, len(hist))).mean().iloc[-1]
+        rsi = self._calculate_rsi(hist['Close'])
+        
+        return {
+            "current_price": f"{current_price:.2f}",
+            "price_change": f"{price_change:.2f}",
+            "volume": f"{hist['Volume'].iloc[-1]:,}",
+            "avg_volume": f"{int(hist['Volume'].mean()):,}",
+            "high": f"{hist['High'].max():.2f}",
+            "low": f"{hist['Low'].min():.2f}",
+            "chart_data": chart_data,
+            "technical_indicators": {
+                "sma_20": f"{sma_20:.2f}",
+                "sma_50": f"{sma_50:.2f}",
+                "rsi": f"{rsi:.2f}",
+            },
+            "market_data": {
+                "market_cap": market["market_cap"],
+                "pe_ratio": 0,  # Simplified for now
+                "dividend_yield": 0,
+                "beta": 0,
+                "52w_high": market["year_high"],
+                "52w_low": market["year_low"],
+            }
+        }
+
+    def prefetch_inputs(self, symbol, company_name, period="5d"):
+        """Load a company's price history and SEC research into the process caches."""
+        self.load_history(symbol, period)
+        self.company_research.get_company_research(symbol, company_name)
+
     def _calculate_rsi(self, prices, period=14):
         """Calculate Relative Strength Index."""
         delta = prices.diff()
@@ -131,13 +208,47 @@ class MarketAnalyst:
         rs = gain / loss
         return 100 - (100 / (1 + rs.iloc[-1]))
 
-    def analyze_market(self, company_name, symbol, news_articles, period="5d"):
+    def _start_sec_research(self, symbol, company_name, deadline, pool="sec", trends_pool="sec_trends"):
+        """Start fetching SEC research in the background with its share of the deadline.
+        
+        Quarterly trends get a shorter slice of sec_deadline inside
+        get_company_research, so when they are slow the filings are still
+        returned before sec_deadline with only the trends omitted.
+        """
+        sec_deadline = deadline.slice(self.sec_budget_fraction) if deadline is not None else None
+        return sec_deadline, start_within(
+            sec_deadline, "SEC research", pool,
+            self.company_research.get_company_research, symbol, company_name, sec_deadline, trends_pool
+        )
+
+    def _wait_sec_research(self, symbol, sec_deadline, future, omitted_sources):
+        """Collect SEC research, or note it as omitted if it missed its deadline."""
+        try:
+            sec_data = wait_within(sec_deadline, "SEC research", future)
+        except DeadlineExceeded as e:
+            self.logger.warning(f"Omitting SEC research for {symbol}: {str(e)}")
+            sec_data = {
+                "success": False,
+                "filing_summary": "SEC filing data omitted - not available in time",
+                "omitted_sources": ["sec_research"]
+            }
+        omitted_sources.extend(sec_data.get('omitted_sources', []))
+        return sec_data
+
+    def analyze_market(self, company_name, symbol, news_articles, period="5d",
+                       chart_format="rows", max_points=None, deadline=None, depth="full"):
         self.logger.info(f"Starting market analysis for {company_name} ({symbol})")
         
         try:
+            omitted_sources = []
+            
+            # SEC research is non-essential: fetch it alongside the stock data
+            self.logger.info("Fetching SEC filings")
+            sec_deadline, sec_future = self._start_sec_research(symbol, company_name, deadline)
+            
             # Get stock data
             self.logger.info(f"Fetching stock data for period: {period}")
-            stock_data = self.get_stock_data(symbol, period)
+            stock_data = self.get_stock_data(symbol, period, chart_format, max_points, deadline)
             self.logger.info("Successfully fetched stock data")
             
             # Prepare news summary
@@ -146,10 +257,10 @@ class MarketAnalyst:
                 f"- {article['title']} ({article['publishedAt']})"
                 for article in news_articles[:5]
             ])
+            sentiment = self.sentiment_scorer.company_sentiment(news_articles)
             
             # Get SEC filings summary
-            self.logger.info("Fetching SEC filings")
-            sec_data = self.company_research.get_company_research(symbol, company_name)
+            sec_data = self._wait_sec_research(symbol, sec_deadline, sec_future, omitted_sources)
             sec_summary = sec_data.get('filing_summary', 'No recent SEC filings found.')
             
             # Prepare input for the analysis chain
@@ -159,12 +270,20 @@ class MarketAnalyst:
                 "symbol": symbol,
                 **stock_data,
                 "news_summary": news_summary,
+                "news_sentiment": self.sentiment_scorer.describe(sentiment['overall']),
                 "sec_summary": sec_summary
             }
             
             # Run the analysis chain
             self.logger.info("Running analysis chain")
-            analysis = self.chain.invoke(chain_input)
+            if depth == "summary":
+                analysis, model = self.model_router.invoke(
+                    "analysis_summary", self.summary_prompt, chain_input, deadline=deadline
+                )
+            else:
+                analysis, model = self.model_router.invoke(
+                    "analysis", self.analysis_prompt, chain_input, deadline=deadline
+                )
             self.logger.info("Analysis completed successfully")
             
             return {
@@ -177,15 +296,10 @@ class MarketAnalyst:
                         "metrics": ["price", "volume"]
                     }
                 },
-                "stock_data": {
-                    "current_price": float(stock_data["current_price"]),
-                    "price_change": float(stock_data["price_change"]),
-                    "percent_change": float(stock_data["price_change"]),
-                    "volume": int(stock_data["volume"].replace(",", "")),
-                    "high_5d": float(stock_data["high"]),
-                    "low_5d": float(stock_data["low"]),
-                    "chart_data": stock_data["chart_data"]
-                }
+                "omitted_sources": omitted_sources,
+                "model": model,
+                "news_sentiment": sentiment['overall'],
+                "stock_data": self._stock_data_summary(stock_data)
             }
         except Exception as e:
             self.logger.error(f"Analysis failed: {str(e)}")
@@ -194,9 +308,153 @@ class MarketAnalyst:
                 "error": f"Failed to analyze market data: {str(e)}"
             }
 
-    def ask_financial_question(self, company_name, symbol, question, news_articles):
+    def _stock_data_summary(self, stock_data):
+        """Convert formatted stock data into the numeric shape returned to clients."""
+        return {
+            "current_price": float(stock_data["current_price"]),
+            "price_change": float(stock_data["price_change"]),
+            "percent_change": float(stock_data["price_change"]),
+            "volume": int(stock_data["volume"].replace(",", "")),
+            "high_5d": float(stock_data["high"]),
+            "low_5d": float(stock_data["low"]),
+            "chart_data": stock_data["chart_data"]
+        }
+
+    def compare_companies(self, companies, news_by_symbol, period="5d",
+                          chart_format="rows", max_points=None, deadline=None):
+        """Compare several companies with one shared fetch and a single LLM call.
+        
+        Stock data and SEC research for every company are fetched concurrently,
+        once each, on the deadline pools reserved for comparisons, and the
+        indicators and filing summaries computed for each company feed one
+        comparative prompt.
+        
+        Args:
+            companies: List of (symbol, company_name) tuples
+            news_by_symbol: Dict mapping each symbol to its news articles
+        """
+        self.logger.info(f"Starting comparison of {', '.join(symbol for symbol, _ in companies)}")
+        
+        try:
+            omitted_sources = []
+            
+            # Start every upstream fetch before waiting on any of them
+            sec_requests = {
+                symbol: self._start_sec_research(symbol, company_name, deadline,
+                                                 pool="compare", trends_pool="compare_trends")
+                for symbol, company_name in companies
+            }
+            stock_futures = {
+                symbol: start_within(deadline, f"stock data for {symbol}", "compare", self.get_stock_data,
+                                     symbol, period, chart_format, max_points, deadline)
+                for symbol, _ in companies
+            }
+            
+            company_blocks = []
+            stock_summaries = {}
+            for symbol, company_name in companies:
+                try:
+                    stock_data = wait_within(deadline, f"stock data for {symbol}", stock_futures[symbol])
+                except Exception as e:
+                    self.logger.error(f"Omitting {symbol} from comparison: {str(e)}")
+                    omitted_sources.append(f"stock_data:{symbol}")
+                    continue
+                
+                sec_deadline, sec_future = sec_requests[symbol]
+                sec_omitted = []
+                sec_data = self._wait_sec_research(symbol, sec_deadline, sec_future, sec_omitted)
+                omitted_sources.extend(f"{source}:{symbol}" for source in sec_omitted)
+                trends = sec_data.get('quarterly_trends') or {}
+                
+                news_summary = "\n".join([
+                    f"  - {article['title']} ({article['publishedAt']})"
+                    for article in news_by_symbol.get(symbol, [])[:5]
+                ]) or "  - No recent news"
+                sentiment = self.sentiment_scorer.company_sentiment(news_by_symbol.get(symbol, []))['overall']
+                indicators = stock_data["technical_indicators"]
+                company_blocks.append(
+                    f"{company_name} ({symbol}):\n"
+                    f"- Current Price: ${stock_data['current_price']} ({stock_data['price_change']}%)\n"
+                    f"- Volume: {stock_data['volume']} (average {stock_data['avg_volume']})\n"
+                    f"- Period High/Low: ${stock_data['high']} / ${stock_data['low']}\n"
+                    f"- SMA 20/50: {indicators['sma_20']} / {indicators['sma_50']}, RSI: {indicators['rsi']}\n"
+                    f"- SEC Filings: {sec_data.get('filing_summary', 'No recent SEC filings found.')}\n"
+                    f"- Quarterly Trends: {trends.get('summary', 'Not available')}\n"
+                    f"- News Sentiment: {self.sentiment_scorer.describe(sentiment)}\n"
+                    f"- Recent News:\n{news_summary}"
+                )
+                stock_summaries[symbol] = self._stock_data_summary(stock_data)
+            
+            if len(stock_summaries) < 2:
+                raise ValueError("Stock data available for fewer than two companies")
+            
+            # Run a single comparative analysis
+            self.logger.info("Running comparison chain")
+            analysis, model = self.model_router.invoke("compare", self.comparison_prompt, {
+                "symbols": ", ".join(stock_summaries),
+                "company_blocks": "\n\n".join(company_blocks)
+            }, deadline=deadline)
+            self.logger.info("Comparison completed successfully")
+            
+            return {
+                "success": True,
+                "analysis": analysis,
+                "data_sources": {
+                    "stock_data": {
+                        "source": "Yahoo Finance",
+                        "period": period,
+                        "metrics": ["price", "volume"]
+                    }
+                },
+                "omitted_sources": omitted_sources,
+                "model": model,
+                "stock_data": stock_summaries
+            }
+        except Exception as e:
+            self.logger.error(f"Comparison failed: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Failed to compare companies: {str(e)}"
+            }
+
+    def index_news(self, symbol, news_articles):
+        """Add news articles to the retrieval index, keyed by URL."""
         try:
-            stock_data = self.get_stock_data(symbol)
+            self.retrieval_index.add_documents(symbol, [
+                {
+                    "id": article.get('url') or article.get('title'),
+                    "source": "News",
+                    "title": article.get('title') or '',
+                    "date": article.get('publishedAt') or '',
+                    "text": "\n\n".join(filter(None, [
+                        article.get('title'),
+                        article.get('description'),
+                        article.get('content')
+                    ]))
+                }
+                for article in news_articles
+            ])
+        except Exception as e:
+            self.logger.error(f"Error indexing news for {symbol}: {str(e)}")
+
+    def _format_context(self, chunks):
+        """Format retrieved chunks for inclusion in a prompt."""
+        if not chunks:
+            return "No relevant news or filing excerpts found."
+        return "\n".join([
+            f"- [{chunk['source']}{', ' + chunk['date'][:10] if chunk['date'] else ''}] "
+            f"{chunk['title']}: {chunk['text']}"
+            for chunk in chunks
+        ])
+
+    def ask_financial_question(self, company_name, symbol, question, news_articles,
+                               chart_format="rows", max_points=None, deadline=None):
+        try:
+            omitted_sources = []
+            sec_deadline, sec_future = self._start_sec_research(symbol, company_name, deadline)
+            
+            stock_data = self.get_stock_data(symbol, chart_format=chart_format, max_points=max_points,
+                                             deadline=deadline)
             if not stock_data:
                 return {
                     "success": False,
@@ -204,14 +462,14 @@ class MarketAnalyst:
                 }
                 
             # Get SEC filings data
-            sec_data = self.company_research.get_company_research(symbol, company_name)
+            sec_data = self._wait_sec_research(symbol, sec_deadline, sec_future, omitted_sources)
             sec_summary = sec_data.get('filing_summary', '') if sec_data.get('success', False) else ''
                 
-            # Format news articles into a summary
-            news_summary = "\n".join([
-                f"- {article['title']}: {article['description']}"
-                for article in news_articles[:5]
-            ])
+            # Index the news and retrieve only the context relevant to the question
+            self.index_news(symbol, news_articles)
+            context = self._format_context(
+                self.retrieval_index.search(symbol, question, top_k=self.retrieval_top_k)
+            )
             
             # Create a specialized prompt for financial questions
             financial_prompt = ChatPromptTemplate.from_template("""
@@ -224,12 +482,12 @@ class MarketAnalyst:
                 - 5-day High: ${high}
                 - 5-day Low: ${low}
                 
-                Recent News:
-                {news_summary}
-                
                 Recent SEC Filings:
                 {sec_summary}
                 
+                Relevant News and Filing Excerpts:
+                {context}
+                
                 Question from a financial professional: {question}
                 
                 Please provide a detailed, professional analysis focusing on:
@@ -243,33 +501,26 @@ class MarketAnalyst:
                 Keep the response concise but thorough, using financial terminology appropriate for a professional audience.
                 """)
             
-            # Create a specialized chain for financial questions
-            qa_chain = financial_prompt | self.llm | StrOutputParser()
-            
             # Prepare input for the chain
             chain_input = {
                 "company_name": company_name,
                 "symbol": symbol,
                 "question": question,
                 **stock_data,
-                "news_summary": news_summary,
+                "context": context,
                 "sec_summary": sec_summary
             }
             
             # Run the analysis chain
-            analysis = qa_chain.invoke(chain_input)
+            analysis, model = self.model_router.invoke(
+                "ask", financial_prompt, chain_input, question=question, deadline=deadline
+            )
             return {
                 "success": True,
                 "analysis": analysis,
-                "stock_data": {
-                    "current_price": float(stock_data["current_price"]),
-                    "price_change": float(stock_data["price_change"]),
-                    "percent_change": float(stock_data["price_change"]),
-                    "volume": int(stock_data["volume"].replace(",", "")),
-                    "high_5d": float(stock_data["high"]),
-                    "low_5d": float(stock_data["low"]),
-                    "chart_data": stock_data["chart_data"]
-                }
+                "omitted_sources": omitted_sources,
+                "model": model,
+                "stock_data": self._stock_data_summary(stock_data)
             }
         except Exception as e:
             return {
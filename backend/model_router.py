@@ -0,0 +1,156 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import openai
+from langchain_openai import ChatOpenAI
+from langchain_core.output_parsers import StrOutputParser
+
+# Model tiers with their expected latency (seconds) and cost (USD per 1k tokens)
+DEFAULT_MODELS = {
+    'fast': {'model': 'gpt-4o-mini', 'expected_latency': 4.0, 'cost_per_1k_tokens': 0.0006},
+    'deep': {'model': 'gpt-4o', 'expected_latency': 12.0, 'cost_per_1k_tokens': 0.01},
+}
+
+# Latency SLO (seconds) for the first attempt on each route and its default tier
+DEFAULT_ROUTES = {
+    'ask': {'slo': 15.0, 'tier': 'fast'},
+    'analysis': {'slo': 20.0, 'tier': 'deep'},
+    'analysis_summary': {'slo': 8.0, 'tier': 'fast'},
+    'compare': {'slo': 20.0, 'tier': 'deep'},
+}
+
+# Questions mentioning any of these need more reasoning than the fast tier offers
+COMPLEX_QUESTION_PATTERN = re.compile(
+    r"\b(why|compare|comparison|versus|vs\.?|forecast|predict|valuation|dcf|scenario|"
+    r"outlook|strategy|strategic|explain|impact|implications?|risk analysis)\b",
+    re.IGNORECASE
+)
+
+# Errors after which the other tier is tried instead of failing the request
+FALLBACK_ERRORS = (
+    TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    openai.RateLimitError,
+)
+
+
+class ModelRouter:
+    """Routes LLM calls between a fast and a deep model tier.
+
+    Short, simple questions and summary-only analyses go to the fast tier;
+    complex questions and full analyses go to the deep tier. The first attempt
+    is bounded by the route's latency SLO, and a timeout or transient API
+    error falls back to the other tier within whatever remains of the request
+    deadline. Latencies observed over the last latency_ttl seconds are tracked
+    per tier; while the deep tier's p95 misses a route's SLO, that route is
+    served by the fast tier. Old samples expire, so the deep tier gets retried.
+    Each answer reports its token usage and the cost it implies at the tier's
+    cost_per_1k_tokens.
+    """
+
+    def __init__(self, models: Optional[Dict[str, Dict[str, Any]]] = None,
+                 routes: Optional[Dict[str, Dict[str, Any]]] = None,
+                 temperature: float = 0.7, short_question_words: int = 25,
+                 latency_window: int = 50, latency_ttl: float = 300.0):
+        self.logger = logging.getLogger(__name__)
+        self.models = models or DEFAULT_MODELS
+        self.routes = routes or DEFAULT_ROUTES
+        self.short_question_words = short_question_words
+        self.latency_ttl = latency_ttl
+        self.llms = {
+            tier: ChatOpenAI(model=profile['model'], temperature=temperature, max_retries=0)
+            for tier, profile in self.models.items()
+        }
+        self._lock = threading.Lock()
+        self._latencies = {tier: deque(maxlen=latency_window) for tier in self.models}
+
+    def _other_tier(self, tier: str) -> str:
+        return 'deep' if tier == 'fast' else 'fast'
+
+    def _recent_latencies(self, tier: str) -> list:
+        cutoff = time.monotonic() - self.latency_ttl
+        with self._lock:
+            return sorted(latency for recorded_at, latency in self._latencies[tier] if recorded_at >= cutoff)
+
+    def p95_latency(self, tier: str) -> Optional[float]:
+        """Observed p95 latency for a tier, or None until enough recent calls are seen."""
+        samples = self._recent_latencies(tier)
+        if len(samples) < 5:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def choose_tier(self, route: str, question: Optional[str] = None) -> str:
+        """Pick the tier for a call on the given route."""
+        tier = self.routes[route]['tier']
+        if route == 'ask' and question is not None:
+            is_simple = (len(question.split()) <= self.short_question_words
+                         and not COMPLEX_QUESTION_PATTERN.search(question))
+            tier = 'fast' if is_simple else 'deep'
+
+        # Serve from the fast tier while the deep one is observed missing this route's SLO
+        slo = self.routes[route]['slo']
+        deep_p95 = self.p95_latency('deep')
+        fast_p95 = self.p95_latency('fast') or self.models['fast']['expected_latency']
+        if tier == 'deep' and deep_p95 is not None and deep_p95 > slo >= fast_p95:
+            self.logger.warning(f"Deep tier p95 exceeds the {route} SLO, routing to the fast tier")
+            tier = 'fast'
+        return tier
+
+    def invoke(self, route: str, prompt, chain_input: Dict[str, Any],
+               question: Optional[str] = None, deadline=None) -> Tuple[str, Dict[str, str]]:
+        """Run prompt | model | StrOutputParser for a route, falling back across tiers.
+
+        Returns:
+            The model output and a dict naming the tier and model that produced
+            it, with the tokens used and their estimated cost in USD (None when
+            the API reports no usage)
+        """
+        tier = self.choose_tier(route, question)
+        attempts = [tier, self._other_tier(tier)]
+
+        for attempt, tier in enumerate(attempts):
+            if deadline is not None:
+                deadline.check("LLM call")
+            is_last = attempt == len(attempts) - 1
+            # The first attempt gets the route SLO, the fallback whatever is left
+            timeout = None if is_last else self.routes[route]['slo']
+            if deadline is not None:
+                timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+
+            llm = self.llms[tier] if timeout is None else self.llms[tier].bind(timeout=timeout)
+            started = time.monotonic()
+            try:
+                message = (prompt | llm).invoke(chain_input)
+            except FALLBACK_ERRORS as e:
+                self._record(tier, time.monotonic() - started)
+                if is_last or (deadline is not None and deadline.expired()):
+                    raise
+                self.logger.warning(f"{tier} tier failed on {route} ({type(e).__name__}), "
+                                    f"falling back to {attempts[attempt + 1]}")
+                continue
+
+            elapsed = time.monotonic() - started
+            self._record(tier, elapsed)
+            usage = getattr(message, 'usage_metadata', None) or {}
+            tokens = usage.get('total_tokens')
+            cost = None
+            if tokens is not None:
+                cost = round(tokens / 1000 * self.models[tier]['cost_per_1k_tokens'], 6)
+            self.logger.info(f"{route} answered by {tier} tier ({self.models[tier]['model']}) in {elapsed:.2f}s, "
+                             f"{tokens} tokens, est. ${cost}")
+            return StrOutputParser().invoke(message), {
+                "tier": tier,
+                "name": self.models[tier]['model'],
+                "tokens": tokens,
+                "estimated_cost_usd": cost
+            }
+
+    def _record(self, tier: str, latency: float) -> None:
+        with self._lock:
+            self._latencies[tier].append((time.monotonic(), latency))
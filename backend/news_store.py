@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+
+class NewsStore:
+    """Per-company rolling window of news articles, refreshed incrementally.
+
+    Each refresh asks NewsAPI only for articles published since the newest one
+    already stored. Articles are deduplicated by URL and by a hash of their
+    normalised title and description (syndicated copies often differ only in
+    URL), and each company keeps at most window_size of the newest articles.
+    """
+
+    def __init__(self, newsapi, window_size: int = 100, refresh_interval: int = 300,
+                 page_size: int = 50):
+        self.logger = logging.getLogger(__name__)
+        self.newsapi = newsapi
+        self.window_size = window_size
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._companies: Dict[str, Dict[str, Any]] = {}
+
+    def _company(self, symbol: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._companies.setdefault(symbol, {
+                'lock': threading.Lock(),
+                'articles': [],
+                'urls': set(),
+                'hashes': set(),
+                'last_refresh': None
+            })
+
+    @staticmethod
+    def _content_hash(article: Dict[str, Any]) -> str:
+        text = f"{article.get('title') or ''}\n{article.get('description') or ''}"
+        return hashlib.sha1(' '.join(text.lower().split()).encode()).hexdigest()
+
+    def refresh(self, symbol: str, query: str, force: bool = False) -> int:
+        """Fetch articles newer than the latest stored one for a company.
+
+        Skipped when the last refresh is younger than refresh_interval unless
+        force is set. Concurrent callers for the same company wait for the
+        refresh in progress instead of issuing their own.
+
+        Returns:
+            Number of new articles stored
+        """
+        company = self._company(symbol)
+        with company['lock']:
+            last_refresh = company['last_refresh']
+            if not force and last_refresh and time.monotonic() - last_refresh < self.refresh_interval:
+                return 0
+
+            params = {
+                'q': query,
+                'language': 'en',
+                'sort_by': 'publishedAt',
+                'page_size': self.page_size
+            }
+            if company['articles']:
+                # NewsAPI accepts YYYY-MM-DDTHH:MM:SS (UTC); 'from' is inclusive,
+                # so the newest stored article comes back and is deduplicated
+                params['from_param'] = company['articles'][0]['publishedAt'][:19]
+
+            self.logger.info(f"Refreshing news for {symbol} from {params.get('from_param', 'scratch')}")
+            response = self.newsapi.get_everything(**params)
+
+            new_articles = []
+            for article in response.get('articles', []):
+                url = article.get('url')
+                content_hash = self._content_hash(article)
+                if not article.get('publishedAt') or url in company['urls'] or content_hash in company['hashes']:
+                    continue
+                company['urls'].add(url)
+                company['hashes'].add(content_hash)
+                new_articles.append(article)
+
+            if new_articles:
+                articles = sorted(company['articles'] + new_articles,
+                                  key=lambda a: a['publishedAt'], reverse=True)
+                company['articles'] = articles[:self.window_size]
+                company['urls'] = {a.get('url') for a in company['articles']}
+                company['hashes'] = {self._content_hash(a) for a in company['articles']}
+
+            company['last_refresh'] = time.monotonic()
+            self.logger.info(f"Stored {len(new_articles)} new articles for {symbol}")
+            return len(new_articles)
+
+    def get_articles(self, symbol: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return up to limit of the newest stored articles, refreshing if stale.
+
+        If the refresh fails, the previously stored articles are served; the
+        error is only raised when nothing is stored yet for the company.
+        """
+        company = self._company(symbol)
+        try:
+            self.refresh(symbol, query)
+        except Exception as e:
+            if not company['articles']:
+                raise
+            self.logger.error(f"Error refreshing news for {symbol}, serving stored articles: {str(e)}")
+        return company['articles'][:limit]
@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+
+class Prefetcher:
+    """Speculatively loads a company's analysis inputs into the process caches.
+
+    Viewing a company's news is almost always followed by its analysis, so the
+    news route hands the company to prefetch(). Loads go through the same
+    single-flight caches the analysis uses, so a follow-up request joins a
+    prefetch still in flight instead of repeating it. The prefetch budget is
+    max_in_flight concurrent prefetches; beyond that, and for companies
+    prefetched less than min_interval seconds ago, requests are dropped.
+    """
+
+    def __init__(self, market_analyst, max_in_flight: int = 2, min_interval: int = 60,
+                 period: str = "5d"):
+        self.logger = logging.getLogger(__name__)
+        self.market_analyst = market_analyst
+        self.min_interval = min_interval
+        self.period = period
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='prefetch')
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._last_started: Dict[str, float] = {}
+
+    def prefetch(self, symbol: str, company_name: str) -> bool:
+        """Start prefetching a company's inputs unless over budget or recently done.
+
+        Returns:
+            True if a prefetch was started
+        """
+        with self._lock:
+            last_started = self._last_started.get(symbol)
+            if last_started and time.monotonic() - last_started < self.min_interval:
+                return False
+            if not self._slots.acquire(blocking=False):
+                self.logger.info(f"Prefetch budget exhausted, skipping {symbol}")
+                return False
+            self._last_started[symbol] = time.monotonic()
+
+        self._executor.submit(self._run, symbol, company_name)
+        return True
+
+    def _run(self, symbol: str, company_name: str) -> None:
+        started = time.monotonic()
+        try:
+            self.market_analyst.prefetch_inputs(symbol, company_name, self.period)
+            self.logger.info(f"Prefetched analysis inputs for {symbol} in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            self.logger.error(f"Error prefetching analysis inputs for {symbol}: {str(e)}")
+        finally:
+            self._slots.release()
@@ -0,0 +1,154 @@
+import logging
+import re
+import threading
+import zlib
+import numpy as np
+from typing import Any, Dict, List
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most my
+no nor not now of off on once only or other our ours out over own same she should so some such
+than that the their theirs them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+
+class RetrievalIndex:
+    """Per-company vector index over news and filing text, held in process memory.
+
+    Embeddings are computed locally with the hashing trick (unigrams and bigrams
+    hashed into a fixed number of dimensions, sublinear term frequency, L2
+    normalised), so cosine similarity is a single matrix-vector product and no
+    external embedding service is involved. Documents are chunked and added
+    incrementally; re-adding a known document id is a no-op.
+    """
+
+    def __init__(self, dimensions: int = 2048, chunk_size: int = 800,
+                 max_chunks_per_company: int = 2000):
+        self.logger = logging.getLogger(__name__)
+        self.dimensions = dimensions
+        self.chunk_size = chunk_size
+        self.max_chunks_per_company = max_chunks_per_company
+        self._lock = threading.Lock()
+        self._companies: Dict[str, Dict[str, Any]] = {}
+
+    def _tokenize(self, text: str) -> List[str]:
+        words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalised hashed term-frequency vectors."""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = self._tokenize(text or '')
+            if not tokens:
+                continue
+            hashes = np.fromiter((zlib.crc32(t.encode()) for t in tokens), dtype=np.uint32, count=len(tokens))
+            columns = (hashes % self.dimensions).astype(np.intp)
+            # Use a hash bit as the sign to keep collisions from only adding up
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], columns, signs)
+
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks of roughly chunk_size characters on paragraph boundaries."""
+        chunks = []
+        current = ''
+        for paragraph in re.split(r'\n\s*\n', text or ''):
+            paragraph = ' '.join(paragraph.split())
+            if not paragraph:
+                continue
+            while len(paragraph) > self.chunk_size:
+                cut = paragraph.rfind('. ', 0, self.chunk_size)
+                cut = cut + 1 if cut > self.chunk_size // 2 else self.chunk_size
+                if current:
+                    chunks.append(current)
+                    current = ''
+                chunks.append(paragraph[:cut].strip())
+                paragraph = paragraph[cut:].strip()
+            if current and len(current) + len(paragraph) + 1 > self.chunk_size:
+                chunks.append(current)
+                current = ''
+            current = f"{current} {paragraph}".strip()
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def add_documents(self, symbol: str, documents: List[Dict[str, Any]]) -> int:
+        """Chunk, embed and add documents that are not yet indexed for a company.
+
+        Args:
+            symbol: Company ticker symbol
+            documents: Dicts with 'id' and 'text', plus optional 'source', 'title'
+                and 'date' metadata returned alongside matching chunks
+
+        Returns:
+            Number of chunks added
+        """
+        with self._lock:
+            known_ids = set(self._companies.get(symbol, {}).get('ids', ()))
+        new_documents = [doc for doc in documents if doc.get('id') and doc['id'] not in known_ids]
+        if not new_documents:
+            return 0
+
+        chunks = []
+        for doc in new_documents:
+            for text in self.chunk_text(doc.get('text', '')):
+                chunks.append({
+                    'id': doc['id'],
+                    'source': doc.get('source', ''),
+                    'title': doc.get('title', ''),
+                    'date': doc.get('date', ''),
+                    'text': text
+                })
+        vectors = self.embed([chunk['text'] for chunk in chunks])
+
+        with self._lock:
+            company = self._companies.setdefault(symbol, {
+                'ids': set(),
+                'chunks': [],
+                'vectors': np.zeros((0, self.dimensions), dtype=np.float32)
+            })
+            # Another request may have indexed the same documents meanwhile
+            keep = [i for i, chunk in enumerate(chunks) if chunk['id'] not in company['ids']]
+            chunks = [chunks[i] for i in keep]
+            company['ids'].update(doc['id'] for doc in new_documents)
+            if chunks:
+                company['chunks'].extend(chunks)
+                company['vectors'] = np.vstack([company['vectors'], vectors[keep]])
+
+            # Keep a bounded window of the most recently added chunks
+            overflow = len(company['chunks']) - self.max_chunks_per_company
+            if overflow > 0:
+                company['chunks'] = company['chunks'][overflow:]
+                company['vectors'] = company['vectors'][overflow:]
+                company['ids'] = {chunk['id'] for chunk in company['chunks']}
+
+        self.logger.info(f"Indexed {len(chunks)} chunks from {len(new_documents)} documents for {symbol}")
+        return len(chunks)
+
+    def search(self, symbol: str, query: str, top_k: int = 5, min_score: float = 0.05) -> List[Dict[str, Any]]:
+        """Return the top_k chunks for a company most similar to the query."""
+        with self._lock:
+            company = self._companies.get(symbol)
+            if not company or not company['chunks']:
+                return []
+            chunks = company['chunks']
+            vectors = company['vectors']
+
+        scores = vectors @ self.embed([query])[0]
+        k = min(top_k, len(chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**chunks[i], 'score': round(float(scores[i]), 4)}
+            for i in top if scores[i] >= min_score
+        ]
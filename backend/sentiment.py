@@ -0,0 +1,220 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:[-'][a-z]+)*")
+# Headlines often use typographic apostrophes ("doesn\u2019t")
+APOSTROPHES = str.maketrans({'\u2019': "'", '\u2018': "'", '\u02bc': "'"})
+
+# Finance-oriented polarity lexicon (weights in [-3, 3]). Inflected forms
+# are listed explicitly; words whose polarity depends on context in headlines
+# ("fine", "top") are left out.
+POSITIVE_TERMS = {
+    ('beat', 'beats', 'beating'): 2.0,
+    ('surge', 'surges', 'surged', 'surging'): 2.5,
+    ('soar', 'soars', 'soared', 'soaring'): 2.5,
+    ('rally', 'rallies', 'rallied', 'rallying'): 2.0,
+    ('gain', 'gains', 'gained', 'gaining'): 1.5,
+    ('rise', 'rises', 'rose', 'risen', 'rising'): 1.0,
+    ('jump', 'jumps', 'jumped', 'jumping'): 2.0,
+    ('climb', 'climbs', 'climbed', 'climbing'): 1.5,
+    ('rebound', 'rebounds', 'rebounded', 'rebounding'): 1.5,
+    ('recover', 'recovers', 'recovered', 'recovering', 'recovery'): 1.5,
+    ('outperform', 'outperforms', 'outperformed', 'outperforming'): 2.0,
+    ('upgrade', 'upgrades', 'upgraded'): 2.0,
+    ('boost', 'boosts', 'boosted', 'boosting'): 1.5,
+    ('expand', 'expands', 'expanded', 'expanding', 'expansion'): 1.0,
+    ('grow', 'grows', 'grew', 'grown', 'growing', 'growth'): 1.5,
+    ('improve', 'improves', 'improved', 'improving', 'improvement'): 1.5,
+    ('exceed', 'exceeds', 'exceeded', 'exceeding'): 2.0,
+    ('topped',): 1.0,
+    ('raise', 'raises', 'raised', 'raising'): 1.0,
+    ('launch', 'launches', 'launched', 'launching'): 0.5,
+    ('win', 'wins', 'won', 'winning'): 2.0,
+    ('approve', 'approves', 'approved', 'approval'): 1.5,
+    ('partnership', 'partnerships'): 1.0,
+    ('innovation', 'innovative'): 1.0,
+    ('profit', 'profits', 'profitable', 'profitability'): 1.5,
+    ('record',): 1.5,
+    ('strong', 'stronger', 'strength'): 1.5,
+    ('strongest',): 2.0,
+    ('robust', 'resilient'): 1.5,
+    ('bullish', 'breakthrough'): 2.5,
+    ('optimistic', 'optimism', 'upbeat', 'success', 'successful', 'excellent', 'impressive'): 2.0,
+    ('higher', 'better', 'good', 'momentum', 'buyback', 'opportunity', 'opportunities', 'all-time'): 1.0,
+    ('positive', 'best', 'great', 'upside', 'accelerate', 'accelerates', 'accelerated', 'accelerating'): 1.5,
+    ('dividend', 'demand'): 0.5,
+}
+NEGATIVE_TERMS = {
+    ('miss', 'misses', 'missed'): -2.0,
+    ('plunge', 'plunges', 'plunged', 'plunging'): -2.5,
+    ('tumble', 'tumbles', 'tumbled', 'tumbling'): -2.5,
+    ('slump', 'slumps', 'slumped', 'slumping'): -2.0,
+    ('drop', 'drops', 'dropped', 'dropping'): -1.5,
+    ('fall', 'falls', 'fell', 'fallen', 'falling'): -1.5,
+    ('decline', 'declines', 'declined', 'declining'): -1.5,
+    ('sink', 'sinks', 'sank', 'sunk', 'sinking'): -2.0,
+    ('slide', 'slides', 'slid', 'sliding'): -1.5,
+    ('crash', 'crashes', 'crashed', 'crashing'): -3.0,
+    ('downgrade', 'downgrades', 'downgraded'): -2.0,
+    ('cut', 'cuts', 'cutting'): -1.5,
+    ('lose', 'loses', 'lost', 'losing', 'loss', 'losses'): -1.5,
+    ('warn', 'warns', 'warned', 'warning', 'warnings'): -2.0,
+    ('delay', 'delays', 'delayed', 'delaying'): -1.5,
+    ('recall', 'recalls', 'recalled'): -2.0,
+    ('sue', 'sues', 'sued', 'suing', 'lawsuit', 'lawsuits'): -2.0,
+    ('probe', 'probes', 'probed', 'investigate', 'investigates', 'investigated', 'investigation'): -1.5,
+    ('fined', 'penalty', 'penalties'): -1.5,
+    ('layoff', 'layoffs'): -2.0,
+    ('underperform', 'underperforms', 'underperformed', 'underperforming'): -2.0,
+    ('struggle', 'struggles', 'struggled', 'struggling'): -1.5,
+    ('halt', 'halts', 'halted', 'halting'): -2.0,
+    ('ban', 'bans', 'banned', 'banning'): -2.0,
+    ('disappoint', 'disappoints', 'disappointed', 'disappointing', 'disappointment'): -2.0,
+    ('weaken', 'weakens', 'weakened', 'weakening'): -1.5,
+    ('shrink', 'shrinks', 'shrank', 'shrunk', 'shrinking'): -1.5,
+    ('weak', 'weaker', 'weakness', 'risky', 'uncertainty', 'slowdown', 'headwinds', 'downside',
+     'worse', 'bad', 'poor', 'negative', 'antitrust', 'concern', 'concerns', 'outage', 'outages'): -1.5,
+    ('bearish',): -2.5,
+    ('pessimistic', 'fear', 'fears', 'selloff', 'sell-off', 'worst', 'recession', 'shortfall',
+     'breach'): -2.0,
+    ('lower', 'risk', 'risks', 'volatile', 'volatility', 'tariff', 'tariffs'): -1.0,
+    ('bankruptcy', 'fraud'): -3.0,
+    ('scandal',): -2.5,
+    ('regulatory',): -0.5,
+}
+
+NEGATORS = frozenset(['not', 'no', 'never', "didn't", "doesn't", "don't", "isn't", "wasn't",
+                      "won't", "can't", 'without', 'fails', 'failed', 'fail'])
+
+
+def _build_lexicon() -> Dict[str, float]:
+    lexicon = {}
+    for terms in (POSITIVE_TERMS, NEGATIVE_TERMS):
+        for words, weight in terms.items():
+            for word in words:
+                lexicon[word] = weight
+    return lexicon
+
+
+class SentimentScorer:
+    """Local lexicon-based sentiment scorer for news articles, CPU only.
+
+    Articles are scored in batches: all tokens of a batch are mapped to lexicon
+    weights in one array, negations flip the following sentiment word, and
+    per-article sums are normalised to [-1, 1]. Scores are cached by article
+    URL so each article is only scored once.
+    """
+
+    def __init__(self, cache_size: int = 10000, neutral_band: float = 0.05):
+        self.logger = logging.getLogger(__name__)
+        self.cache_size = cache_size
+        self.neutral_band = neutral_band
+        lexicon = _build_lexicon()
+        self._vocabulary = {word: i for i, word in enumerate(lexicon)}
+        self._weights = np.array(list(lexicon.values()), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[str, float]' = OrderedDict()
+
+    def score_texts(self, texts: List[str]) -> np.ndarray:
+        """Score a batch of texts, returning one score in [-1, 1] per text."""
+        doc_ids, indices, negated = [], [], []
+        for doc_id, text in enumerate(texts):
+            previous = ''
+            for token in TOKEN_PATTERN.findall((text or '').lower().translate(APOSTROPHES)):
+                index = self._vocabulary.get(token)
+                if index is not None:
+                    doc_ids.append(doc_id)
+                    indices.append(index)
+                    negated.append(previous in NEGATORS)
+                previous = token
+
+        if not indices:
+            return np.zeros(len(texts), dtype=np.float32)
+
+        weights = self._weights[np.array(indices)]
+        weights = np.where(np.array(negated), -0.75 * weights, weights)
+        totals = np.bincount(np.array(doc_ids), weights=weights, minlength=len(texts))
+        # Same normalisation as VADER: saturates smoothly towards +/-1
+        return (totals / np.sqrt(totals * totals + 15.0)).astype(np.float32)
+
+    def score_articles(self, articles: List[Dict[str, Any]]) -> List[float]:
+        """Score articles by title and description, reusing cached scores by URL."""
+        scores: List[Any] = [None] * len(articles)
+        missing = []
+        with self._lock:
+            for i, article in enumerate(articles):
+                url = article.get('url')
+                if url and url in self._cache:
+                    self._cache.move_to_end(url)
+                    scores[i] = self._cache[url]
+                else:
+                    missing.append(i)
+
+        if missing:
+            batch = self.score_texts([
+                f"{articles[i].get('title') or ''}. {articles[i].get('description') or ''}"
+                for i in missing
+            ])
+            with self._lock:
+                for i, score in zip(missing, batch.tolist()):
+                    scores[i] = round(score, 4)
+                    url = articles[i].get('url')
+                    if url:
+                        self._cache[url] = scores[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def label(self, score: float) -> str:
+        if score > self.neutral_band:
+            return 'positive'
+        if score < -self.neutral_band:
+            return 'negative'
+        return 'neutral'
+
+    def company_sentiment(self, articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aggregate article scores into an overall score and a daily time series."""
+        scores = self.score_articles(articles)
+        daily: Dict[str, List[float]] = {}
+        for article, score in zip(articles, scores):
+            daily.setdefault((article.get('publishedAt') or '')[:10], []).append(score)
+
+        overall = float(np.mean(scores)) if scores else 0.0
+        labels = [self.label(score) for score in scores]
+        return {
+            "overall": {
+                "score": round(overall, 4),
+                "label": self.label(overall),
+                "articles": len(scores),
+                "positive": labels.count('positive'),
+                "negative": labels.count('negative'),
+                "neutral": labels.count('neutral')
+            },
+            "series": [
+                {"date": date, "score": round(float(np.mean(day)), 4), "articles": len(day)}
+                for date, day in sorted(daily.items()) if date
+            ],
+            "articles": [
+                {
+                    "title": article.get('title'),
+                    "url": article.get('url'),
+                    "publishedAt": article.get('publishedAt'),
+                    "score": score,
+                    "label": label
+                }
+                for article, score, label in zip(articles, scores, labels)
+            ]
+        }
+
+    def describe(self, overall: Dict[str, Any]) -> str:
+        """One-line description of an overall sentiment for prompts."""
+        if not overall['articles']:
+            return "No recent news to score."
+        return (f"{overall['label'].title()} (average {overall['score']:+.2f} across "
+                f"{overall['articles']} articles: {overall['positive']} positive, "
+                f"{overall['negative']} negative, {overall['neutral']} neutral)")